@@ -0,0 +1,34 @@
+"""Compare two benchmark result files: median time per benchmark and the ratio new/old.
+
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline', type=Path)
+    parser.add_argument('candidate', type=Path)
+    args = parser.parse_args()
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    print(f"baseline:  {baseline['git']['commit']}  {baseline['created_at']}")
+    print(f"candidate: {candidate['git']['commit']}  {candidate['created_at']}")
+    
+    for scale, results in candidate['scales'].items():
+        old_results = baseline['scales'].get(scale, {}).get('benchmarks', {})
+        print(f"\n{scale}x ({results['rows']} rows)")
+        print(f"  {'benchmark':60s} {'old ms':>10s} {'new ms':>10s} {'ratio':>7s}")
+        for name, stats in results['benchmarks'].items():
+            new = stats['median'] * 1000
+            if name in old_results:
+                old = old_results[name]['median'] * 1000
+                print(f"  {name:60s} {old:10.3f} {new:10.3f} {new / old if old else float('nan'):7.2f}")
+            else:
+                print(f"  {name:60s} {'-':>10s} {new:10.3f} {'-':>7s}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Synthetic JoSAA seat data shaped like the files in data/, at a multiple of their row counts.
+
+Every template file is repeated `scale` times. Copy 0 is the original; each further copy
+renames the institutes ("... Campus 2") and jitters all ranks by a per-institute factor,
+so row counts, column layout, categories, branches and cities match the real files while
+the number of distinct colleges grows with the scale.
+
+    python -m benchmarks.generate_data --scale 10
+"""
+import argparse
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.data_service import GEO_DATA_FILE_KEY, SEAT_SCHEMA_VERSION, normalize_column_name, parse_source_file
+from services.snapshot_store import SnapshotStore, file_signature
+
+logger = logging.getLogger(__name__)
+
+# Bump when the generated data changes, so cached datasets are rebuilt
+GENERATOR_VERSION = 2
+TEMPLATE_FILES = ['iit_combined.xlsx', 'nit_combined.xlsx']
+GEO_FILE = 'Geo_data_INDIA_all_cities.xlsx'
+DEFAULT_OUTPUT = Path(__file__).parent / '.data'
+# Normalized names of the rank columns that are jittered in every copy
+RANK_COLUMN_NAMES = {'openingrank', 'closingrank', 'clrank'}
+
+
+def synthesize(template: pd.DataFrame, scale: int, rng: np.random.Generator) -> pd.DataFrame:
+    """`scale` copies of template with renamed institutes and jittered ranks"""
+    institute_column = next(col for col in template.columns if normalize_column_name(col) == 'institute')
+    rank_columns = [
+        col for col in template.columns
+        if normalize_column_name(col) in RANK_COLUMN_NAMES and pd.api.types.is_numeric_dtype(template[col])
+    ]
+    institutes, institute_ids = np.unique(template[institute_column].astype(str), return_inverse=True)
+    
+    copies = [template]
+    for copy in range(1, scale):
+        df = template.copy()
+        df[institute_column] = template[institute_column].astype(str) + f" Campus {copy + 1}"
+        # One factor per institute keeps each campus internally consistent
+        factors = rng.uniform(0.85, 1.15, len(institutes))[institute_ids]
+        for col in rank_columns:
+            df[col] = np.maximum(1, np.round(template[col] * factors)).astype(template[col].dtype)
+        copies.append(df)
+    return pd.concat(copies, ignore_index=True)
+
+
+def generate(
+    scale: int,
+    output_root: Path = DEFAULT_OUTPUT,
+    source_folder: Path = Path('data'),
+    templates: Optional[List[str]] = None,
+    seed: int = 0,
+    columnar: bool = True,
+    force: bool = False
+) -> Path:
+    """Write the dataset for `scale` (xlsx plus columnar snapshots) and return its data folder.
+
+    An existing folder generated with the same parameters is reused.
+    """
+    templates = templates or TEMPLATE_FILES
+    data_folder = Path(output_root) / f"{scale}x"
+    manifest_path = data_folder / 'generated.json'
+    manifest = {
+        'generator_version': GENERATOR_VERSION,
+        # Snapshots are only valid for the seat schema they were written with
+        'seat_schema_version': SEAT_SCHEMA_VERSION,
+        'scale': scale,
+        'seed': seed,
+        'templates': templates,
+        'columnar': columnar
+    }
+    if not force and manifest_path.exists():
+        existing = json.loads(manifest_path.read_text())
+        if {key: existing.get(key) for key in manifest} == manifest:
+            return data_folder
+    
+    if data_folder.exists():
+        shutil.rmtree(data_folder)
+    data_folder.mkdir(parents=True)
+    snapshot_store = SnapshotStore(data_folder / '.snapshots') if columnar else None
+    rng = np.random.default_rng(seed)
+    rows: Dict[str, int] = {}
+    
+    for filename in templates:
+        template = pd.read_excel(Path(source_folder) / filename, engine='openpyxl')
+        df = synthesize(template, scale, rng)
+        target_path = data_folder / filename
+        logger.info(f"Writing {len(df)} rows to {target_path}")
+        df.to_excel(target_path, index=False, engine='openpyxl')
+        rows[filename] = len(df)
+        if snapshot_store:
+            # Parsed back from the written file, exactly as a real load would
+            file_key = target_path.stem.lower()
+            seats = parse_source_file(str(target_path), file_key)
+            snapshot_store.save(file_key, file_signature(target_path), SEAT_SCHEMA_VERSION, seats)
+    
+    # City coordinates are shared by every scale
+    geo_path = data_folder / GEO_FILE
+    shutil.copyfile(Path(source_folder) / GEO_FILE, geo_path)
+    if snapshot_store:
+        snapshot_store.save(
+            GEO_DATA_FILE_KEY, file_signature(geo_path), SEAT_SCHEMA_VERSION,
+            parse_source_file(str(geo_path), GEO_DATA_FILE_KEY)
+        )
+    
+    manifest['rows'] = rows
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return data_folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100], help='Row count multiples to generate')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='Folder receiving one <scale>x folder per scale')
+    parser.add_argument('--source', type=Path, default=Path('data'), help='Folder with the template files')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-columnar', action='store_true', help='Only write xlsx files')
+    parser.add_argument('--force', action='store_true', help='Regenerate even if the folder is up to date')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for scale in args.scale:
+        folder = generate(scale, args.output, args.source, seed=args.seed, columnar=not args.no_columnar, force=args.force)
+        print(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Benchmark suite: microbenchmarks of the data and recommendation services plus end-to-end
+/predict-colleges requests, on synthetic datasets at several scales.
+
+Each scale runs in its own process (main.py reads its data folder from the environment at
+import), and the results of all scales are written to one JSON file for comparing commits.
+
+    python -m benchmarks.run --scale 1 10
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from benchmarks.generate_data import DEFAULT_OUTPUT, generate
+
+RESULTS_FORMAT = 1
+DEFAULT_RESULTS = Path(__file__).parent / 'results'
+
+# Request bodies covering the main pipeline paths: plain rank window, distance filter, preferences
+PROFILES = {
+    'open_5k': {'rank': 5000, 'category': 'OPEN', 'gender': 'Gender-Neutral'},
+    'obc_25k_distance': {
+        'rank': 25000, 'category': 'OBC-NCL', 'gender': 'Female-only (including Supernumerary)',
+        'home_city': 'Chennai', 'home_state': 'Tamil Nadu', 'max_distance_km': 800
+    },
+    'sc_60k_preferences': {
+        'rank': 60000, 'category': 'SC', 'gender': 'Gender-Neutral', 'home_city': 'Delhi',
+        'preferred_institutes': ['NIT'], 'preferred_branches': ['Computer', 'Electronics'], 'max_distance_km': 1500
+    }
+}
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Run fn `repeat` times after one untimed warm-up call; timings in seconds"""
+    if setup:
+        setup()
+    fn()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        'runs': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'max': max(timings)
+    }
+
+
+def run_scale(scale: int, data_folder: Path, repeat: int) -> Dict[str, Any]:
+    """All benchmarks for one generated dataset (the process environment points main.py at it)"""
+    from fastapi.testclient import TestClient
+    from models.student_input import StudentInput
+    from services.data_service import DataService
+    from services.recommendation_service import RecommendationService
+    
+    results: Dict[str, Any] = {}
+    snapshot_folder = data_folder / '.snapshots'
+    # One loop for every async call: asyncio.run per call adds event loop setup (and a repr of
+    # DataFrame results on teardown) that dwarfs the code being measured
+    loop = asyncio.new_event_loop()
+    # Loads are slow at large scales, so they get fewer runs
+    load_repeat = max(1, min(repeat, 3))
+    
+    def load(snapshots: bool) -> DataService:
+        service = DataService(str(data_folder), snapshot_folder_path=str(snapshot_folder) if snapshots else None)
+        loop.run_until_complete(service.load_all_data())
+        return service
+    
+    results['load_all_data[xlsx]'] = measure(lambda: load(False), load_repeat)
+    results['load_all_data[columnar]'] = measure(lambda: load(True), load_repeat)
+    
+    data_service = load(True)
+    dataset = data_service.dataset
+    recommendation_service = RecommendationService(data_service)
+    
+    def reset_filters():
+        dataset.payloads.clear()
+    
+    results['get_available_filters'] = measure(
+        lambda: loop.run_until_complete(data_service.get_available_filters()), repeat, setup=reset_filters
+    )
+    results['get_available_filters[cached]'] = measure(lambda: loop.run_until_complete(data_service.get_available_filters()), repeat)
+    
+    for name, body in PROFILES.items():
+        student_input = StudentInput(**body)
+        filters = recommendation_service._build_filters(student_input)
+        results[f'get_filtered_data[{name}]'] = measure(
+            lambda: loop.run_until_complete(data_service.get_filtered_data(filters)), repeat
+        )
+        filtered = data_service.filter_seats(filters, dataset)
+        if student_input.max_distance_km:
+            results[f'_filter_by_distance[{name}]'] = measure(
+                lambda: recommendation_service._filter_by_distance(
+                    filtered, student_input, student_input.max_distance_km, dataset
+                ),
+                repeat
+            )
+            filtered = recommendation_service._filter_by_distance(
+                filtered, student_input, student_input.max_distance_km, dataset
+            )
+        results[f'_calculate_recommendation_scores[{name}]'] = measure(
+            lambda: recommendation_service._calculate_recommendation_scores(
+                filtered, student_input, recommendation_service.max_recommendations
+            ),
+            repeat
+        )
+    
+    loop.close()
+    
+    import main
+    with TestClient(main.app) as client:
+        for name, body in PROFILES.items():
+            # Cold: a new rank every call misses the result cache; warm: the same body hits it
+            ranks = iter(range(body['rank'], body['rank'] + 10 * (repeat + 1) + 1, 10))
+            
+            def cold():
+                response = client.post('/predict-colleges', json=dict(body, rank=next(ranks)))
+                response.raise_for_status()
+            
+            def warm():
+                response = client.post('/predict-colleges', json=body)
+                response.raise_for_status()
+            
+            results[f'predict_colleges[{name},cold]'] = measure(cold, repeat)
+            results[f'predict_colleges[{name},warm]'] = measure(warm, repeat)
+    
+    return {
+        'rows': len(dataset.seat_table),
+        'benchmarks': results
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args) -> str:
+        return subprocess.run(['git', *args], capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def environment() -> Dict[str, Any]:
+    import numpy as np
+    import pandas as pd
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__
+    }
+
+
+def run_child(scale: int, data_folder: Path, repeat: int, output: Path):
+    """Run one scale in a fresh interpreter configured through the environment"""
+    env = dict(
+        os.environ,
+        DATA_FOLDER_PATH=str(data_folder),
+        SNAPSHOT_FOLDER_PATH=str(data_folder / '.snapshots')
+    )
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--child', str(scale), '--data', str(data_folder),
+         '--repeat', str(repeat), '--output', str(output)],
+        env=env,
+        check=True
+    )
+    return json.loads(output.read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10], help='Dataset sizes as multiples of the real data')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per benchmark')
+    parser.add_argument('--data-root', type=Path, default=DEFAULT_OUTPUT, help='Where generated datasets are kept')
+    parser.add_argument('--output', type=Path, default=None, help='Results file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--child', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--data', type=Path, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child is not None:
+        args.output.write_text(json.dumps(run_scale(args.child, args.data, args.repeat)))
+        return
+    
+    revision = git_revision()
+    report = {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git': revision,
+        'environment': environment(),
+        'repeat': args.repeat,
+        'scales': {}
+    }
+    for scale in args.scale:
+        data_folder = generate(scale, args.data_root).resolve()
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"Running scale {scale}x ({data_folder})", file=sys.stderr)
+            report['scales'][str(scale)] = run_child(scale, data_folder, args.repeat, Path(tmp) / 'result.json')
+    
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = DEFAULT_RESULTS / f"{stamp}-{(revision['commit'] or 'nogit')[:8]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    
+    for scale, scale_results in report['scales'].items():
+        print(f"\n{scale}x ({scale_results['rows']} rows)")
+        for name, stats in scale_results['benchmarks'].items():
+            print(f"  {name:60s} {stats['median'] * 1000:10.3f} ms")
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,35 @@ from functools import lru_cache
 
 class Settings(BaseSettings):
     data_folder_path: str = "data"
+    # Parsed Excel snapshots for fast startup; empty disables them
+    snapshot_folder_path: str = "data/.snapshots"
+    # Largest accepted /upload-excel file
+    max_upload_mb: int = 50
+    # Processes parsing Excel files on load; 0 uses one per CPU, 1 parses in a thread
+    ingest_workers: int = 0
+    # Cutoffs held in memory and searched by default: files directly in data_folder_path hold
+    # these; other years and rounds go in data/<year>/round_<n>/ and are loaded when queried
+    default_cutoff_year: int = 2023
+    default_cutoff_round: int = 6
+    # Datasets of other years and rounds kept after a query selected them
+    partition_cache_size: int = 4
+    # Folder (ideally on tmpfs, e.g. /dev/shm/college-finder) where one process publishes the loaded
+    # dataset for all uvicorn workers to memory-map; empty gives every process its own copy
+    shared_dataset_path: str = ""
     max_recommendations: int = 50
+    # Most students accepted by one /predict-colleges/batch call
+    max_batch_size: int = 1000
+    recommendation_cache_size: int = 1024
+    recommendation_cache_ttl_seconds: int = 300
+    # Full rankings kept for paginated /predict-colleges (they expire with the result cache TTL)
+    ranked_cache_size: int = 256
+    # Where recommendation compute runs: "thread" shares the loaded data, "process" gives each worker a copy
+    compute_executor: str = "thread"
+    compute_workers: int = 0
+    compute_queue_size: int = 64
+    compute_timeout_seconds: float = 30
     geocoding_timeout: int = 10
+    geo_cache_size: int = 4096
     log_level: str = "INFO"
     
     class Config:
@@ -1,16 +1,19 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-import os
 import logging
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from typing import List, Optional
 import json
+import time
 from pathlib import Path
 
 from services.data_service import DataService
-from services.recommendation_service import RecommendationService
+from services.recommendation_service import RecommendationService, CursorExpiredError
+from services.compute_pool import ComputePool, ComputeOverloadedError, ComputeTimeoutError
+from services.ingest_jobs import IngestJobManager, UploadTooLargeError
+from services.metrics import REGISTRY, HTTP_REQUEST_SECONDS, STAGE_SECONDS
+from services.payloads import JSONPayload
 from models.student_input import StudentInput
 from models.college_response import CollegeResponse
 from config.settings import get_settings
@@ -52,8 +55,75 @@ app.add_middleware(
 
 # Initialize services
 settings = get_settings()
-data_service = DataService(settings.data_folder_path)
-recommendation_service = RecommendationService(data_service)
+data_service = DataService(
+    settings.data_folder_path,
+    geo_cache_size=settings.geo_cache_size,
+    snapshot_folder_path=settings.snapshot_folder_path,
+    ingest_workers=settings.ingest_workers,
+    default_partition=(settings.default_cutoff_year, settings.default_cutoff_round),
+    partition_cache_size=settings.partition_cache_size,
+    shared_dataset_path=settings.shared_dataset_path or None
+)
+recommendation_service = RecommendationService(
+    data_service,
+    max_recommendations=settings.max_recommendations,
+    cache_size=settings.recommendation_cache_size,
+    cache_ttl_seconds=settings.recommendation_cache_ttl_seconds,
+    compute_pool=ComputePool(
+        mode=settings.compute_executor,
+        workers=settings.compute_workers,
+        queue_size=settings.compute_queue_size,
+        timeout=settings.compute_timeout_seconds
+    ),
+    ranked_cache_size=settings.ranked_cache_size
+)
+def _cache_samples(field: str):
+    """Samples of one cache statistic for the result, location and filter caches"""
+    filters = {'hits': data_service.filters_cache_hits, 'misses': data_service.filters_cache_misses}
+    return [
+        ({'cache': 'recommendations'}, recommendation_service.result_cache.stats()[field]),
+        ({'cache': 'locations'}, data_service.geo_service.location_cache.stats()[field]),
+        ({'cache': 'filters'}, filters[field])
+    ]
+
+REGISTRY.register_callback('cache_hits_total', 'Cache lookups served from cache', 'counter', lambda: _cache_samples('hits'))
+REGISTRY.register_callback('cache_misses_total', 'Cache lookups that had to compute the value', 'counter', lambda: _cache_samples('misses'))
+REGISTRY.register_callback(
+    'data_generation', 'Version of the currently loaded dataset', 'gauge',
+    lambda: [({}, data_service.generation)]
+)
+
+ingest_jobs = IngestJobManager(data_service, max_upload_bytes=settings.max_upload_mb * 1024 * 1024)
+
+def _payload_response(request: Request, payload: JSONPayload) -> Response:
+    """Serve a precomputed payload: 304 when the client's copy is current, gzip when accepted"""
+    gzip_accepted = 'gzip' in request.headers.get('accept-encoding', '').lower()
+    headers = {
+        'ETag': payload.gzip_etag if gzip_accepted else payload.etag,
+        # Clients may keep the body but must revalidate it, which costs a 304 when unchanged
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    if payload.matches(request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=headers)
+    if gzip_accepted:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(payload.gzipped, media_type="application/json", headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Time every request, labelled by route template so ids in paths do not explode the series"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        path=route.path if route else 'unmatched',
+        status=response.status_code
+    )
+    return response
 
 @app.on_event("startup")
 async def startup_event():
@@ -64,26 +134,59 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to load data on startup: {str(e)}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the compute pool workers"""
+    recommendation_service.compute_pool.shutdown()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "JEE College Recommendation API is running"}
+    return {
+        "status": "healthy",
+        "message": "JEE College Recommendation API is running",
+        "data": data_service.load_status.get('state')
+    }
+
+@app.get("/load-status")
+async def get_load_status():
+    """Progress and per-file timing of the current or last data load"""
+    return JSONResponse(content=data_service.load_status)
 
 @app.get("/filters")
-async def get_filters():
-    """Get available filter options from loaded data"""
+async def get_filters(request: Request):
+    """Get available filter options from loaded data (ETag and If-None-Match supported)"""
     try:
-        filters = await data_service.get_available_filters()
-        return JSONResponse(content=filters)
+        payload = await data_service.get_filters_payload()
+        return _payload_response(request, payload)
     except Exception as e:
         logger.error(f"Error getting filters: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve filters")
 
 @app.post("/predict-colleges", response_model=List[CollegeResponse])
-async def predict_colleges(student_input: StudentInput):
+async def predict_colleges(
+    student_input: StudentInput,
+    explain: bool = Query(False, description="Include per-result score breakdowns and filter funnel counts"),
+    page_size: Optional[int] = Query(None, ge=1, le=500, description="Return the full ranking in pages of this size")
+):
     """Predict suitable colleges based on student preferences"""
+    if explain and page_size:
+        raise HTTPException(status_code=400, detail="explain and page_size cannot be combined")
     try:
-        logger.info(f"Received prediction request: {student_input}")
+        logger.debug(f"Received prediction request: {student_input}")
+        
+        if page_size:
+            # Paginated responses: {"recommendations": [...], "total", "offset", "next_cursor"}
+            page = await recommendation_service.get_first_page(student_input, page_size)
+            return JSONResponse(content=jsonable_encoder(page))
+        
+        if explain:
+            # Explain responses wrap the list: {"recommendations": [...], "explain": {...}}
+            recommendations, details = await recommendation_service.explain_recommendations(student_input)
+            return JSONResponse(content=jsonable_encoder({
+                "recommendations": recommendations,
+                "explain": details
+            }))
         
         # Get college recommendations
         recommendations = await recommendation_service.get_recommendations(student_input)
@@ -97,49 +200,114 @@ async def predict_colleges(student_input: StudentInput):
                 }
             )
         
-        return recommendations
+        started = time.perf_counter()
+        content = jsonable_encoder(recommendations)
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='serialization')
+        return JSONResponse(content=content)
         
     except ValueError as ve:
         logger.error(f"Validation error: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
+    except ComputeOverloadedError as oe:
+        logger.warning(f"Rejected prediction request: {str(oe)}")
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
+    except ComputeTimeoutError as te:
+        logger.error(f"Prediction timed out: {str(te)}")
+        raise HTTPException(status_code=504, detail="Prediction timed out")
     except Exception as e:
         logger.error(f"Error predicting colleges: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to predict colleges")
 
-@app.post("/upload-excel")
+@app.get("/predict-colleges/page")
+async def predict_colleges_page(cursor: str = Query(..., min_length=1, description="next_cursor of the previous page")):
+    """Next page of a paginated /predict-colleges ranking"""
+    try:
+        page = await recommendation_service.get_page(cursor)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except CursorExpiredError as ce:
+        raise HTTPException(status_code=410, detail=str(ce))
+    return JSONResponse(content=jsonable_encoder(page))
+
+@app.post("/predict-colleges/batch")
+async def predict_colleges_batch(students: List[StudentInput]):
+    """Predict colleges for many students, streaming one NDJSON line per student as each completes"""
+    if len(students) > settings.max_batch_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch has {len(students)} students, the limit is {settings.max_batch_size}"
+        )
+    
+    async def ndjson_lines():
+        async for result in recommendation_service.stream_batch(students):
+            yield json.dumps(jsonable_encoder(result)) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.get("/nearby-colleges")
+async def nearby_colleges(
+    city: str = Query(..., min_length=1, description="City to search around"),
+    radius_km: float = Query(100, ge=0, le=5000, description="Search radius in kilometers"),
+    k: int = Query(10, ge=1, le=200, description="Number of nearest seats to return")
+):
+    """Colleges within a radius of a city and the nearest seats to it"""
+    try:
+        result = await recommendation_service.get_nearby_colleges(city, radius_km, k)
+    except Exception as e:
+        logger.error(f"Error finding nearby colleges: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to find nearby colleges")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown city: {city}")
+    return JSONResponse(content=result)
+
+@app.post("/upload-excel", status_code=202)
 async def upload_excel_file(file: UploadFile = File(...)):
-    """Upload and replace Excel data files"""
+    """Upload an Excel data file and ingest it in the background"""
+    # Only the base name is used, so an upload cannot be written outside the data folder
+    filename = Path(file.filename or '').name
+    if not filename.endswith('.xlsx'):
+        raise HTTPException(status_code=400, detail="Only .xlsx files are allowed")
+    
     try:
-        if not file.filename.endswith('.xlsx'):
-            raise HTTPException(status_code=400, detail="Only .xlsx files are allowed")
-        
-        # Save uploaded file
-        file_path = os.path.join(settings.data_folder_path, file.filename)
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Reload data with new file
-        await data_service.load_all_data()
-        
-        logger.info(f"Successfully uploaded and loaded: {file.filename}")
-        
-        return JSONResponse(content={
-            "message": f"File {file.filename} uploaded successfully",
-            "status": "success"
-        })
-        
+        job = await ingest_jobs.submit(filename, file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to upload file")
+    
+    logger.info(f"Received {filename} ({job['bytes']} bytes), ingestion job {job['job_id']}")
+    return JSONResponse(status_code=202, content={
+        "message": f"File {filename} uploaded, ingestion started",
+        "status": "accepted",
+        "job_id": job['job_id'],
+        "status_url": f"/upload-jobs/{job['job_id']}"
+    })
+
+@app.get("/upload-jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Progress, row counts and timing of an ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return JSONResponse(content=job)
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    """Get hit-rate statistics of the in-process caches"""
+    return JSONResponse(content=recommendation_service.cache_stats())
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latency histograms, per-stage row counters and cache statistics in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/data-summary")
-async def get_data_summary():
-    """Get summary of loaded data"""
+async def get_data_summary(request: Request):
+    """Get summary of loaded data (ETag and If-None-Match supported)"""
     try:
-        summary = await data_service.get_data_summary()
-        return JSONResponse(content=summary)
+        payload = await data_service.get_summary_payload()
+        return _payload_response(request, payload)
     except Exception as e:
         logger.error(f"Error getting data summary: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get data summary")
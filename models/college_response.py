@@ -19,6 +19,7 @@ class CollegeResponse(BaseModel):
     institute_type: str
     recommendation_score: float
     cutoff_year: Optional[str]
+    cutoff_round: Optional[int] = None
     additional_info: Optional[Dict[str, Any]] = {}
 
     model_config: ClassVar[dict] = {
@@ -46,7 +47,8 @@ class CollegeResponse(BaseModel):
                 "distance_km": 15.5,
                 "institute_type": "IIT",
                 "recommendation_score": 95.5,
-                "cutoff_year": "2023"
+                "cutoff_year": "2023",
+                "cutoff_round": 6
             }
         }
     }
\ No newline at end of file
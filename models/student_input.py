@@ -21,6 +21,10 @@ class StudentInput(BaseModel):
     category: CategoryType = Field(..., description="Student category")
     gender: GenderType = Field(..., description="Gender preference")
     home_city: Optional[str] = None
+    home_state: Optional[str] = Field(
+        default=None,
+        description="Home state, used for home-state scoring and when home_city is not given"
+    )
     preferred_institutes: List[str] = Field(
         default=["IIT", "NIT", "IIIT", "GFTI"], 
         description="Preferred institute types"
@@ -43,6 +47,24 @@ class StudentInput(BaseModel):
         ge=1,
         description="Maximum closing rank to filter colleges (optional)"
     )
+    quotas: Optional[List[str]] = Field(
+        default=None,
+        description="Seat quotas to search, e.g. ['AI', 'OS'] (defaults to all quotas)"
+    )
+    max_results: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=500,
+        description="Number of recommendations to return (defaults to MAX_RECOMMENDATIONS)"
+    )
+    years: Optional[List[int]] = Field(
+        default=None,
+        description="Cutoff years to search, together (defaults to DEFAULT_CUTOFF_YEAR)"
+    )
+    rounds: Optional[List[int]] = Field(
+        default=None,
+        description="JoSAA rounds to search, together (defaults to DEFAULT_CUTOFF_ROUND)"
+    )
 
     @validator('rank')
     def validate_rank(cls, v):
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, Tuple
+
+from services.cache import LRUCache
+
+
+class BranchMatcher:
+    """Interned branch names and the branches each preference token matches.
+
+    Preferences are case-insensitive substrings ('CSE', 'Computer'). There are only a few
+    hundred distinct branches, so a token is matched against the interned names once per
+    dataset and cached; a request then turns its preferences into a set of branch codes
+    and filters rows with an integer lookup.
+    """
+
+    def __init__(self, branches: pd.Series, cache_size: int = 1024):
+        codes, names = pd.factorize(branches)
+        # Per-row code into names, -1 for a missing branch
+        self.codes = codes.astype(np.int32)
+        self.names = pd.Index(names).astype(str).str.upper()
+        # Names that are present but empty score like missing ones
+        self.has_name = np.append(self.names != '', False)
+        self._token_matches = LRUCache(cache_size)
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, names: pd.Index, cache_size: int = 1024) -> "BranchMatcher":
+        """Matcher over already interned rows: per-row codes into upper-case names"""
+        matcher = cls.__new__(cls)
+        matcher.codes = codes
+        matcher.names = names
+        matcher.has_name = np.append(names != '', False)
+        matcher._token_matches = LRUCache(cache_size)
+        return matcher
+
+    def _token_match(self, token: str) -> np.ndarray:
+        matches = self._token_matches.get(token)
+        if matches is None:
+            matches = np.append(np.asarray(self.names.str.contains(token, regex=False), dtype=bool), False)
+            self._token_matches.put(token, matches)
+        return matches
+
+    def matching_names(self, tokens: Iterable[str]) -> np.ndarray:
+        """Boolean per branch code (plus a trailing False for missing) matching any token"""
+        matched = np.zeros(len(self.names) + 1, dtype=bool)
+        for token in tokens:
+            matched |= self._token_match(token.upper())
+        return matched
+
+    def mask(self, codes: np.ndarray, tokens: Iterable[str]) -> np.ndarray:
+        """Rows (given by branch code) whose branch matches any token"""
+        # Code -1 picks the trailing False
+        return self.matching_names(tokens)[codes]
+
+    def match_and_presence(self, codes: np.ndarray, tokens: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows matching any token, and rows with a non-empty branch name"""
+        return self.mask(codes, tokens), self.has_name[codes]
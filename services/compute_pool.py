@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ComputeOverloadedError(Exception):
+    """Raised when the compute queue is full"""
+
+
+class ComputeTimeoutError(Exception):
+    """Raised when a job does not finish within the pool timeout"""
+
+
+class ComputePool:
+    """Runs synchronous CPU-bound jobs on a thread or process executor with a bounded queue.
+
+    At most `workers + queue_size` jobs are admitted at once; further submissions fail fast
+    with ComputeOverloadedError. Callers stop waiting after `timeout` seconds, but a job
+    keeps its slot until it has actually finished, so timed-out work still counts.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = 0,
+        queue_size: int = 64,
+        timeout: Optional[float] = 30,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = ()
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown compute executor mode: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout or None
+        self.initializer = initializer
+        self.initargs = initargs
+        self.submitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=self.initializer, initargs=self.initargs
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compute")
+            logger.info(f"Started {self.mode} compute pool with {self.workers} workers")
+        return self._executor
+
+    def reset(self, initargs: Optional[Tuple] = None):
+        """Replace the executor (e.g. so process workers pick up new data); running jobs finish on the old one"""
+        with self._lock:
+            if initargs is not None:
+                self.initargs = initargs
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise ComputeOverloadedError(f"Compute queue is full ({self._in_flight} jobs in flight)")
+            self._in_flight += 1
+            self.submitted += 1
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self._in_flight -= 1
+                raise
+        future.add_done_callback(self._release)
+        try:
+            # shield keeps a timeout from cancelling the job while it still holds its slot
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise ComputeTimeoutError(f"Job did not finish within {self.timeout}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'timeout_seconds': self.timeout,
+            'in_flight': self._in_flight,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out
+        }
@@ -1,276 +1,691 @@
 import pandas as pd
+import numpy as np
 import os
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import asyncio
 import re
+from collections import defaultdict
+
+from services.cache import LRUCache
+from services.dataset import Dataset, Segment
+from services.geo_service import GeoService
+from services.institutes import preferred_type_codes
+from services.metrics import record_stage
+from services.partitions import Partition, PartitionFile, SourceFile, discover_source_files
+from services.payloads import JSONPayload
+from services.seat_index import BitmapIndex
+from services.shared_dataset import PartitionDatasetStore, SharedDatasetStore
+from services.snapshot_store import SnapshotStore, file_signature, same_content
 
 logger = logging.getLogger(__name__)
 
+# Key of the city coordinates workbook, which is not seat data
+GEO_DATA_FILE_KEY = 'geo_data_india_all_cities'
+
+# Canonical seat table schema: column -> accepted source column names, in priority order
+SEAT_COLUMN_ALIASES = {
+    'institute': ['institute', 'institute_name', 'college_name', 'college'],
+    'branch': ['branch', 'course', 'program'],
+    'quota': ['state_quota', 'quota', 'quota_type'],
+    'category': ['category', 'caste_category'],
+    'gender': ['gender', 'gender_type'],
+    'opening_rank': ['opening_rank'],
+    'closing_rank': ['closing_rank'],
+    'city': ['city', 'location', 'place'],
+    'state': ['state', 'college_state', 'institute_state'],
+}
+RANK_COLUMNS = ('opening_rank', 'closing_rank')
+# Bump whenever _to_seat_frame changes, so stale snapshots are re-parsed
+SEAT_SCHEMA_VERSION = 2
+COORDINATE_COLUMNS = ['latitude', 'longitude']
+SEAT_COLUMNS = list(SEAT_COLUMN_ALIASES) + COORDINATE_COLUMNS + ['source_file']
+# /filters option lists -> the seat table column they are read from
+FILTER_COLUMNS = {
+    'states': 'state',
+    'branches': 'branch',
+    'categories': 'category',
+    'genders': 'gender',
+    'institutes': 'institute',
+    'quotas': 'quota',
+    'cities': 'city'
+}
+# Low-cardinality text columns, stored as categoricals (one copy of each distinct string)
+TEXT_COLUMNS = [col for col in SEAT_COLUMNS if col not in RANK_COLUMNS and col not in COORDINATE_COLUMNS]
+
+
+def normalize_column_name(name) -> str:
+    return re.sub(r'[^a-z0-9]', '', str(name).lower().strip())
+
+
+def safe_int(value) -> int:
+    """Safely convert a rank value (number or messy string) to integer, 0 when missing"""
+    try:
+        if value is None or pd.isna(value):
+            return 0
+        if isinstance(value, str):
+            # Remove any non-numeric characters except decimal point
+            cleaned = ''.join(c for c in value if c.isdigit() or c == '.')
+            if not cleaned:
+                return 0
+            return int(float(cleaned))
+        return int(float(value))
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Failed to convert '{value}' to int: {e}")
+        return 0
+
+
+def to_rank_array(values: pd.Series) -> np.ndarray:
+    """Apply safe_int to a whole column, converting each distinct value only once"""
+    codes, uniques = pd.factorize(values)
+    # Missing values get code -1, which picks the trailing 0
+    lookup = np.array([safe_int(value) for value in uniques] + [0], dtype=np.int64)
+    return lookup[codes].astype(np.int32)
+
+
+def to_seat_frame(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Map one raw Excel sheet onto the canonical seat table schema"""
+    # Later columns win when two headers normalize to the same name
+    columns_by_name = {normalize_column_name(col): col for col in df.columns}
+    seats = {}
+    for column, aliases in SEAT_COLUMN_ALIASES.items():
+        values = None
+        for alias in aliases:
+            source_col = columns_by_name.get(normalize_column_name(alias))
+            if source_col is None:
+                continue
+            candidate = df[source_col]
+            # Empty cells fall through to the next alias, like missing ones
+            candidate = candidate.where(candidate.notna() & (candidate != ''))
+            values = candidate if values is None else values.fillna(candidate)
+        if values is None:
+            values = pd.Series(None, index=df.index, dtype=object)
+        if column in RANK_COLUMNS:
+            seats[column] = to_rank_array(values)
+        else:
+            values = values.astype(object)
+            seats[column] = pd.Categorical(values.where(values.isna(), values.astype(str)))
+    seats['source_file'] = pd.Categorical([source] * len(df))
+    return pd.DataFrame(seats, columns=[col for col in SEAT_COLUMNS if col not in COORDINATE_COLUMNS])
+
+
+def table_memory_bytes(df: pd.DataFrame) -> int:
+    """Bytes used by a table, counting the strings it references (once per category for categoricals)"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def text_values(values: pd.Series, missing: str) -> pd.Series:
+    """Values as strings with missing ones replaced; categoricals are converted per category"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = np.append(values.cat.categories.astype(str).to_numpy(dtype=object), missing)
+        # Missing values have code -1, which picks the trailing label
+        return pd.Series(labels[values.cat.codes.to_numpy()], index=values.index)
+    return values.fillna(missing).astype(str)
+
+
+def parse_source_file(file_path: str, file_key: str) -> pd.DataFrame:
+    """Parse one Excel file into its normalized table (runs in an ingestion worker process)"""
+    df = pd.read_excel(file_path, engine='openpyxl')
+    if file_key != GEO_DATA_FILE_KEY:
+        # Rows of different files never collide (source_file differs), so dedupe per file
+        df = to_seat_frame(df, file_key).drop_duplicates(ignore_index=True)
+    return df
+
+
 class DataService:
-    def __init__(self, data_folder_path: str):
+    def __init__(
+        self,
+        data_folder_path: str,
+        geo_cache_size: int = 4096,
+        snapshot_folder_path: Optional[str] = None,
+        ingest_workers: int = 0,
+        default_partition: Partition = (2023, 6),
+        partition_cache_size: int = 4,
+        shared_dataset_path: Optional[str] = None
+    ):
         self.data_folder_path = Path(data_folder_path)
-        self.data_cache: Dict[str, pd.DataFrame] = {}
-        self.filters_cache: Optional[Dict[str, List[str]]] = None
+        self.snapshot_store = SnapshotStore(snapshot_folder_path) if snapshot_folder_path else None
+        # Datasets of selected cutoff partitions, stored next to the snapshots they are built from
+        self.partition_store = (
+            PartitionDatasetStore(Path(snapshot_folder_path) / '_partitions', SEAT_SCHEMA_VERSION)
+            if snapshot_folder_path else None
+        )
+        self.geo_cache_size = geo_cache_size
+        # 0 means one worker process per CPU; 1 parses in a background thread instead
+        self.ingest_workers = ingest_workers
+        # The (year, round) held resident and searched when a query selects none
+        self.default_partition = tuple(default_partition)
+        # Datasets for queries selecting other years or rounds, by (generation, partitions)
+        self.partition_cache = LRUCache(partition_cache_size)
+        # Shared mode: one process loads and publishes, the others attach to its memory-mapped copy
+        self.shared_store = (
+            SharedDatasetStore(shared_dataset_path, SEAT_SCHEMA_VERSION, self.default_partition)
+            if shared_dataset_path else None
+        )
+        # A publication that failed to attach is not retried on every request
+        self._failed_generation = 0
+        self.load_status: Dict[str, Any] = {'state': 'idle', 'files': {}}
+        # The current immutable dataset; every reload builds a new one and swaps it in whole
+        self.dataset: Optional[Dataset] = None
+        self._empty_geo_service = GeoService(cache_size=geo_cache_size)
+        # Lookups of the per-dataset filter options, for the metrics endpoint
+        self.filters_cache_hits = 0
+        self.filters_cache_misses = 0
+        # Serializes reloads and lets concurrent first requests share one initial load
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Version of the current dataset, bumped on every successful load"""
+        return self.dataset.generation if self.dataset else 0
+
+    @property
+    def geo_service(self) -> GeoService:
+        return self.dataset.geo_service if self.dataset else self._empty_geo_service
+
+    async def ensure_loaded(self) -> Dataset:
+        """Return the current dataset, loading it first if nothing has been loaded yet.
+
+        In shared mode a newer dataset published by another process is attached first.
+        """
+        if self.dataset is None or self._published_is_newer():
+            async with self._load_lock:
+                if self._published_is_newer():
+                    await asyncio.to_thread(self._attach_published)
+                if self.dataset is None:
+                    await self._reload()
+        return self.dataset
         
     async def load_all_data(self):
-        """Load all Excel files from the data folder"""
+        """Reload the data folder and swap in the new dataset; only changed files are re-parsed"""
+        async with self._load_lock:
+            await self._reload()
+
+    def _published_is_newer(self) -> bool:
+        if self.shared_store is None:
+            return False
+        return self.shared_store.current_generation() > max(self.generation, self._failed_generation)
+
+    def _attach_published(self) -> bool:
+        """Swap in the newest dataset published to the shared store, if newer than ours (synchronous)"""
+        generation = self.shared_store.current_generation()
+        if generation <= self.generation:
+            return False
+        started = time.perf_counter()
+        try:
+            dataset = self.shared_store.attach(self.geo_cache_size)
+        except Exception as e:
+            self._failed_generation = generation
+            logger.warning(f"Could not attach shared dataset generation {generation}: {str(e)}")
+            return False
+        if dataset is None:
+            return False
+        self.dataset = dataset
+        self.partition_cache.clear()
+        elapsed = time.perf_counter() - started
+        self.load_status = {
+            'state': 'ready',
+            'source': 'shared',
+            'seconds': round(elapsed, 3),
+            'generation': dataset.generation,
+            'files': {}
+        }
+        logger.info(
+            f"Attached shared dataset generation {dataset.generation}, {len(dataset.seat_table)} seats "
+            f"in {elapsed:.3f}s"
+        )
+        return True
+
+    async def _reload(self):
+        if self.shared_store is None:
+            await self._reload_files()
+            return
+        # Other processes wait here, then find the files unchanged and attach what was published
+        await asyncio.to_thread(self.shared_store.acquire)
+        try:
+            await asyncio.to_thread(self._attach_published)
+            await self._reload_files()
+        finally:
+            self.shared_store.release()
+
+    async def _reload_files(self):
+        started = time.perf_counter()
+        previous = self.dataset
         try:
-            self.data_cache.clear()
-            
             if not self.data_folder_path.exists():
                 raise FileNotFoundError(f"Data folder not found: {self.data_folder_path}")
             
-            excel_files = list(self.data_folder_path.glob("*.xlsx"))
+            source_files = discover_source_files(self.data_folder_path, self.default_partition)
             
-            if not excel_files:
+            if not source_files:
                 raise FileNotFoundError("No Excel files found in data folder")
             
-            for file_path in excel_files:
-                try:
-                    df = pd.read_excel(file_path, engine='openpyxl')
-                    file_key = file_path.stem.lower()
-                    self.data_cache[file_key] = df
-                    logger.info(f"Loaded {len(df)} records from {file_path.name}")
-                except Exception as e:
-                    logger.error(f"Error loading {file_path.name}: {str(e)}")
+            self.load_status = {
+                'state': 'loading',
+                'files_total': len(source_files),
+                'files_done': 0,
+                'files': {source.file_key: {'status': 'pending'} for source in source_files}
+            }
+            
+            # Unchanged files are reused and snapshots checked first; only the rest go to the workers
+            with self._ingest_executor(len(source_files)) as executor:
+                results = await asyncio.gather(*[
+                    self._load_source_file(source, executor, previous)
+                    for source in source_files
+                ])
+            # A file that fails to load keeps serving its previous version, if there was one
+            results = [self._with_fallback(result, previous) for result in results]
             
-            # Clear filters cache to force regeneration
-            self.filters_cache = None
+            if self.shared_store and self._all_reused(results, previous):
+                # The published dataset is current; publishing it again would only copy it
+                dataset = previous
+            else:
+                # Combining and indexing is CPU work too, so it also runs off the event loop
+                dataset = await asyncio.to_thread(self._build_dataset, results, previous)
+                if self.shared_store:
+                    dataset = await asyncio.to_thread(self._publish, dataset)
+            # Requests already running keep the dataset they started with
+            self.dataset = dataset
+            # Datasets of other years and rounds were built from the previous files
+            self.partition_cache.clear()
             
-            logger.info(f"Successfully loaded {len(self.data_cache)} Excel files")
+            elapsed = time.perf_counter() - started
+            self.load_status.update(state='ready', seconds=round(elapsed, 3), generation=dataset.generation)
+            logger.info(
+                f"Successfully loaded {len(dataset.segments)} Excel files, {len(dataset.seat_table)} seats "
+                f"in {elapsed:.2f}s (generation {dataset.generation})"
+            )
             
         except Exception as e:
+            self.load_status.update(state='failed', error=str(e))
             logger.error(f"Error loading data: {str(e)}")
             raise
 
-    async def get_available_filters(self) -> Dict[str, List[str]]:
-        """Get all available filter options from the loaded data"""
-        if self.filters_cache:
-            return self.filters_cache
-        
-        if not self.data_cache:
-            await self.load_all_data()
+    def _with_fallback(self, result: Tuple, previous: Optional[Dataset]) -> Tuple:
+        """A failed file's result turned into reuse of its previous version; other results as given"""
+        source, _, _, origin = result
+        known = self._previous_signature(previous, source.file_key)
+        if origin != 'failed' or known is None:
+            return result
+        self.load_status['files'][source.file_key]['source'] = 'previous'
+        logger.warning(f"Keeping the previously loaded version of {source.path.name}")
+        return source, known, None, 'reused'
+
+    def _all_reused(self, results: List[Tuple], previous: Optional[Dataset]) -> bool:
+        """Whether every file is unchanged since `previous` and none was removed"""
+        if previous is None or any(result[3] != 'reused' for result in results):
+            return False
+        previous_files = len(previous.segments) + len(previous.partition_files) + bool(previous.geo_signature)
+        return len(results) == previous_files
+
+    def _publish(self, dataset: Dataset) -> Dataset:
+        """Publish a freshly built dataset and return it attached, so this process shares it too"""
+        generation = self.shared_store.publish(dataset)
+        attached = self.shared_store.attach(self.geo_cache_size)
+        logger.info(f"Published shared dataset generation {generation}")
+        return attached
+
+    def _ingest_executor(self, n_files: int) -> Executor:
+        workers = self.ingest_workers or os.cpu_count() or 1
+        workers = min(workers, n_files)
+        if workers <= 1:
+            return ThreadPoolExecutor(max_workers=1)
+        return ProcessPoolExecutor(max_workers=workers)
+
+    async def _load_source_file(
+        self,
+        source: SourceFile,
+        executor: Executor,
+        previous: Optional[Dataset]
+    ) -> Tuple[SourceFile, Optional[Dict[str, Any]], Optional[pd.DataFrame], str]:
+        """Load one file, recording progress; returns (source, signature, table, origin)
+
+        Files whose size and modification time are unchanged since the previous dataset
+        are not read at all; others are hashed, and reused as well when only their
+        modification time changed (origin 'reused', table None). Otherwise the snapshot
+        is tried before parsing.
+        Files outside the default partition only need a valid snapshot: they are parsed
+        when it is missing, and their table is kept only if there is no snapshot store.
+        """
+        started = time.perf_counter()
+        file_path, file_key = source.path, source.file_key
+        resident = source.partition == self.default_partition
+        file_status = self.load_status['files'][file_key]
+        file_status['status'] = 'loading'
+        try:
+            known = self._previous_signature(previous, file_key)
+            signature = await asyncio.to_thread(file_signature, file_path, known)
+            df = None
+            if same_content(known, signature):
+                origin = 'reused'
+            elif not resident and self.snapshot_store and await asyncio.to_thread(
+                self.snapshot_store.has, file_key, signature, SEAT_SCHEMA_VERSION
+            ):
+                origin = 'snapshot'
+            else:
+                origin = 'snapshot'
+                if self.snapshot_store and resident:
+                    df = await asyncio.to_thread(self.snapshot_store.load, file_key, signature, SEAT_SCHEMA_VERSION)
+                if df is None:
+                    origin = 'excel'
+                    loop = asyncio.get_running_loop()
+                    df = await loop.run_in_executor(executor, parse_source_file, str(file_path), file_key)
+                    if self.snapshot_store:
+                        await asyncio.to_thread(self.snapshot_store.save, file_key, signature, SEAT_SCHEMA_VERSION, df)
+                        if not resident:
+                            file_status['records'] = len(df)
+                            df = None
+            elapsed = time.perf_counter() - started
+            file_status.update(status='loaded', source=origin, seconds=round(elapsed, 3))
+            if df is not None:
+                file_status['records'] = len(df)
+            logger.info(f"Loaded {file_path.name} ({origin}) in {elapsed:.2f}s")
+            return source, signature, df, origin
+        except Exception as e:
+            file_status.update(status='failed', error=str(e), seconds=round(time.perf_counter() - started, 3))
+            logger.error(f"Error loading {file_path.name}: {str(e)}")
+            return source, None, None, 'failed'
+        finally:
+            self.load_status['files_done'] += 1
+
+    def save_snapshot(self, file_path: Path, file_key: str, df: pd.DataFrame):
+        """Store an already parsed table as the snapshot of file_path, so the next load skips parsing it"""
+        if self.snapshot_store:
+            self.snapshot_store.save(file_key, file_signature(file_path), SEAT_SCHEMA_VERSION, df)
+
+    def _previous_signature(self, previous: Optional[Dataset], file_key: str) -> Optional[Dict[str, Any]]:
+        """Signature the file had in the previous dataset, None if it was not part of it"""
+        if previous is None:
+            return None
+        if file_key == GEO_DATA_FILE_KEY:
+            return previous.geo_signature
+        segment = previous.segments.get(file_key) or previous.partition_files.get(file_key)
+        return segment.signature if segment is not None else None
+
+    def _build_dataset(self, results: List[Tuple], previous: Optional[Dataset]) -> Dataset:
+        """Assemble the next dataset, reusing segments and geo lookup of unchanged files"""
+        geo_result = next((result for result in results if result[0].file_key == GEO_DATA_FILE_KEY), None)
+        if geo_result and geo_result[3] == 'reused':
+            # A touched file keeps its content, but the new mtime saves hashing it next time
+            geo_service, geo_signature = previous.geo_service, geo_result[1]
+        else:
+            geo_service = GeoService(cache_size=self.geo_cache_size)
+            geo_service.load(geo_result[2] if geo_result else None)
+            geo_signature = geo_result[1] if geo_result and geo_result[2] is not None else None
         
-        filters = {
-            "states": set(),
-            "branches": set(),
-            "categories": set(),
-            "genders": set(),
-            "institutes": set(),
-            "quotas": set(),
-            "cities": set()
-        }
+        segments = []
+        partitions = defaultdict(list)
+        for source, signature, df, origin in results:
+            file_key = source.file_key
+            if file_key == GEO_DATA_FILE_KEY or origin == 'failed':
+                continue
+            if source.partition != self.default_partition:
+                # Not held resident: only listed, and loaded when a query selects the partition
+                if origin == 'reused':
+                    partition_file = previous.partition_files[file_key]._replace(signature=signature)
+                else:
+                    partition_file = PartitionFile(file_key, source.path, signature, df)
+                partitions[source.partition].append(partition_file)
+                continue
+            if origin == 'reused':
+                segment = previous.segments[file_key]
+                if segment.signature != signature:
+                    segment = segment.with_signature(signature)
+                # Coordinates only need resolving again when the geo workbook changed
+                if geo_service is not previous.geo_service:
+                    segment = segment.with_coordinates(geo_service)
+            else:
+                segment = Segment(file_key, signature, df, source.partition).with_coordinates(geo_service)
+            segments.append(segment)
         
+        generation = (previous.generation if previous else 0) + 1
+        return Dataset(
+            generation, segments, geo_service, to_seat_frame(pd.DataFrame(), ''), geo_signature, dict(partitions)
+        )
+
+    def select_partitions(
+        self,
+        dataset: Dataset,
+        years: Optional[List[int]] = None,
+        rounds: Optional[List[int]] = None
+    ) -> Dataset:
+        """The dataset holding the seats of the given cutoff years and rounds (synchronous).
+
+        Years and rounds default to the default partition, which is `dataset` itself. Any
+        other selection is built once from the partitions' snapshots and stored with its
+        indexes in partition_store, from which it is memory-mapped; partition_cache keeps
+        the attached datasets for later queries on the same data generation.
+        """
+        selected_years = set(years or [self.default_partition[0]])
+        selected_rounds = set(rounds or [self.default_partition[1]])
+        selected = [
+            partition for partition in dataset.partition_keys
+            if partition[0] in selected_years and partition[1] in selected_rounds
+        ]
+        if not selected and (years or rounds):
+            raise ValueError(
+                f"No cutoff data for year(s) {sorted(selected_years)}, round(s) {sorted(selected_rounds)}; "
+                f"available: {', '.join(f'{year} round {round_no}' for year, round_no in dataset.partition_keys)}"
+            )
+        if not selected or selected == [self.default_partition]:
+            # Without a selection the resident dataset is searched, even when it has no seats
+            return dataset
+
+        key = (dataset.generation, tuple(selected))
+        partition_dataset = self.partition_cache.get(key)
+        if partition_dataset is None:
+            partition_dataset = self._partition_dataset(dataset, selected)
+            self.partition_cache.put(key, partition_dataset)
+        return partition_dataset
+
+    def _partition_dataset(self, dataset: Dataset, selected: List[Partition]) -> Dataset:
+        """Dataset of the selected partitions: attached from partition_store, or built (and stored)"""
+        files = []
+        for partition in selected:
+            if partition == self.default_partition:
+                files.extend((segment.file_key, segment.signature) for segment in dataset.segments.values())
+            else:
+                files.extend((partition_file.file_key, partition_file.signature)
+                             for partition_file in dataset.partitions[partition])
+        selection_key = self.partition_store.selection_key(files, dataset.geo_signature) if self.partition_store else None
+        if selection_key is not None:
+            partition_dataset = self.partition_store.attach(selection_key, dataset.generation, dataset.geo_service)
+            if partition_dataset is not None:
+                return partition_dataset
+
+        started = time.perf_counter()
+        segments = []
+        for partition in selected:
+            if partition == self.default_partition:
+                segments.extend(dataset.segments.values())
+                continue
+            for partition_file in dataset.partitions[partition]:
+                seats = self._partition_seats(partition_file)
+                segments.append(Segment(partition_file.file_key, partition_file.signature, seats, partition)
+                                .with_coordinates(dataset.geo_service))
+        partition_dataset = Dataset(
+            dataset.generation, segments, dataset.geo_service, to_seat_frame(pd.DataFrame(), ''), dataset.geo_signature
+        )
+        logger.info(
+            f"Built dataset for {len(selected)} cutoff partitions, {len(partition_dataset.seat_table)} seats "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        if selection_key is None:
+            return partition_dataset
+        # Searched through the stored copy, so this process holds no private copy of the seats
+        self.partition_store.save(selection_key, partition_dataset)
+        return self.partition_store.attach(selection_key, dataset.generation, dataset.geo_service) or partition_dataset
+
+    def _partition_seats(self, partition_file: PartitionFile) -> pd.DataFrame:
+        """Seat table of a non-resident file: kept in memory, memory-mapped from its snapshot, or parsed"""
+        if partition_file.seats is not None:
+            return partition_file.seats
+        if self.snapshot_store:
+            seats = self.snapshot_store.load(
+                partition_file.file_key, partition_file.signature, SEAT_SCHEMA_VERSION, mmap=True
+            )
+            if seats is not None:
+                return seats
+        return parse_source_file(str(partition_file.path), partition_file.file_key)
+
+    async def get_available_filters(self) -> Dict[str, List[str]]:
+        """Get all available filter options from the loaded data"""
+        return (await self.get_filters_payload()).data
+
+    async def get_filters_payload(self) -> JSONPayload:
+        """Filter options of the current dataset, serialized and compressed once per generation"""
+        dataset = await self.ensure_loaded()
+        payload = dataset.payloads.get('filters')
+        if payload is not None:
+            self.filters_cache_hits += 1
+            return payload
+        self.filters_cache_misses += 1
         try:
-            for df in self.data_cache.values():
-                # Standardize column names (handle variations)
-                df_columns = [col.lower().replace(' ', '_') for col in df.columns]
-                
-                # Map common column variations
-                column_mapping = {
-                    'state': ['state', 'college_state', 'institute_state'],
-                    'branch': ['branch', 'course', 'program'],
-                    'category': ['category', 'caste_category'],
-                    'gender': ['gender', 'gender_type'],
-                    'institute': ['institute', 'institute_name', 'college_name'],
-                    'quota': ['quota', 'quota_type'],
-                    'city': ['city', 'location', 'place']
-                }
-                
-                for filter_key, possible_cols in column_mapping.items():
-                    for col in possible_cols:
-                        if col in df_columns:
-                            idx = df_columns.index(col)
-                            actual_col = df.columns[idx]
-                            unique_values = df[actual_col].dropna().unique()
-                            # Fix pluralization for filter keys
-                            if filter_key == "branch":
-                                key_name = "branches"
-                            elif filter_key == "category":
-                                key_name = "categories"
-                            elif filter_key == "city":
-                                key_name = "cities"
-                            else:
-                                key_name = f"{filter_key}s"
-                            filters[key_name].update(unique_values)
-                            break
-            
-            # Convert sets to sorted lists
-            self.filters_cache = {
-                key: sorted(list(values)) for key, values in filters.items()
-            }
-            
-            # Add cities from geo_data Excel
-            geo_df = pd.read_excel('data/Geo_data_INDIA_all_cities.xlsx')
-            cities = sorted(list(set(str(city).strip() for city in geo_df['City'].dropna().unique())))
-            self.filters_cache['cities'] = cities
-            
-            return self.filters_cache
-            
+            payload = JSONPayload(self._filter_options(dataset))
         except Exception as e:
             logger.error(f"Error generating filters: {str(e)}")
             raise
+        dataset.payloads['filters'] = payload
+        return payload
+
+    def _filter_options(self, dataset: Dataset) -> Dict[str, List[str]]:
+        """Sorted distinct values of each filter column, read from the categoricals' used categories"""
+        filter_options = {}
+        for key, column in FILTER_COLUMNS.items():
+            values = dataset.seat_table[column]
+            codes = np.unique(values.cat.codes.to_numpy())
+            filter_options[key] = sorted(str(value) for value in values.cat.categories[codes[codes >= 0]])
+        # Every city of the geo workbook can be searched, not only those with seats
+        if dataset.geo_service.city_names:
+            filter_options['cities'] = dataset.geo_service.city_names
+        return filter_options
 
     async def get_filtered_data(self, filters: Dict[str, Any]) -> pd.DataFrame:
         """Get filtered college data based on provided filters"""
-        if not self.data_cache:
-            await self.load_all_data()
-        
-        combined_df = pd.DataFrame()
-        
-        for file_key, df in self.data_cache.items():
-            # Skip geo_data file as it's not college data
-            if file_key == 'geo_data_india_all_cities':
-                continue
-            
-            # Normalize columns before any logging or filtering
-            df = df.copy()
-            df.columns = [col.lower().replace(' ', '_') for col in df.columns]
-            
-            # Debug: show which file is being filtered
-            logger.info(f"Filtering file: {file_key}, columns: {list(df.columns)}")
-            if 'institute' in df.columns:
-                logger.info(f"Sample institute values: {df['institute'].unique()[:5]}")
-            
-            # Extra debug: log sample IIT data
-            if file_key.startswith('iit'):
-                logger.info(f"[IIT DEBUG] Sample IIT data: {df.head(3).to_dict('records')}")
-            
-            # Apply filters to each dataframe
-            filtered_df = self._apply_filters_to_dataframe(df, filters)
-            
-            if not filtered_df.empty:
-                # Add source information
-                filtered_df = filtered_df.copy()
-                filtered_df['source_file'] = file_key
-                combined_df = pd.concat([combined_df, filtered_df], ignore_index=True)
-        
-        # Remove duplicate rows
-        logger.info(f"Combined results before dropping duplicates: {len(combined_df)} rows")
-        combined_df = combined_df.drop_duplicates()
-        logger.info(f"Combined results after dropping duplicates: {len(combined_df)} rows")
-        
-        # Debug: log preferred_institutes filter
-        logger.info(f"[FILTER DEBUG] preferred_institutes: {filters.get('preferred_institutes')}")
+        dataset = await self.ensure_loaded()
+        return self.filter_seats(filters, dataset)
+
+    def filter_seats(
+        self,
+        filters: Dict[str, Any],
+        dataset: Optional[Dataset] = None,
+        funnel: Optional[Dict[str, int]] = None
+    ) -> pd.DataFrame:
+        """Synchronous filter over one dataset, the current one by default (safe to call from worker threads).
+
+        `quotas` (e.g. ['HS', 'OS']) keeps only seats of those quotas.
+        If a `funnel` dict is given, the row count left after each filter step is recorded in it.
+        """
+        dataset = dataset or self.dataset
+        seat_table = dataset.seat_table
+        started = time.perf_counter()
+        try:
+            # Rank window, category and gender come straight from the rank index
+            category = (filters.get('category') or '').upper()
+            if category == 'GENERAL':
+                category = 'OPEN'
+            positions = dataset.lookup(
+                category=category or None,
+                gender=(filters.get('gender') or '').upper() or None,
+                min_closing_rank=filters.get('rank'),
+                max_closing_rank=filters.get('max_closing_rank'),
+            )
+        except Exception as e:
+            logger.error(f"Error querying rank index: {str(e)}")
+            return seat_table.iloc[0:0]
+        record_stage('rank_index', started, len(seat_table), len(positions))
         
-        return combined_df
-
-    def _apply_filters_to_dataframe(self, df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
-        """Apply filters to a single dataframe (robust version)"""
-        # Normalize columns
-        df = df.copy()
-        df.columns = [col.lower().replace(' ', '_') for col in df.columns]
-        expected_columns = ['institute', 'branch', 'category', 'gender', 'city', 'state', 'closing_rank']
-        for col in expected_columns:
-            if col not in df.columns:
-                df[col] = None
-        filtered_df = df.copy()
+        started = time.perf_counter()
+        rank_window = len(positions)
         try:
-            # Rank filter
-            if 'rank' in filters and filters['rank']:
-                if 'closing_rank' in filtered_df.columns and not filtered_df['closing_rank'].dropna().empty:
-                    filtered_df = filtered_df[
-                        pd.to_numeric(filtered_df['closing_rank'], errors='coerce') >= filters['rank']
-                    ]
-            # Max closing rank filter
-            if 'max_closing_rank' in filters and filters['max_closing_rank']:
-                if 'closing_rank' in filtered_df.columns and not filtered_df['closing_rank'].dropna().empty:
-                    filtered_df = filtered_df[
-                        pd.to_numeric(filtered_df['closing_rank'], errors='coerce') <= filters['max_closing_rank']
-                    ]
-            # Category filter
-            if 'category' in filters and filters['category']:
-                if 'category' in filtered_df.columns and not filtered_df['category'].dropna().empty:
-                    category = filters['category'].upper()
-                    if category == 'GENERAL':
-                        category = 'OPEN'
-                    filtered_df = filtered_df[
-                        filtered_df['category'].str.upper().str.contains(category, na=False)
-                    ]
-            # Gender filter
-            if 'gender' in filters and filters['gender']:
-                if 'gender' in filtered_df.columns and not filtered_df['gender'].dropna().empty:
-                    gender = filters['gender'].upper()
-                    filtered_df = filtered_df[
-                        filtered_df['gender'].str.upper().str.contains(gender, na=False)
-                    ]
-            # Institute filter
-            if 'preferred_institutes' in filters and filters['preferred_institutes']:
-                institute_cols = ['institute', 'institute_name', 'college_name']
-                institute_col = None
-                for col in institute_cols:
-                    if col in filtered_df.columns and not filtered_df[col].dropna().empty:
-                        institute_col = col
-                        break
-                if institute_col:
-                    institutes = [inst.upper() for inst in filters['preferred_institutes']]
-                    logger.info(f"Institute filter using column: {institute_col}")
-                    logger.info(f"Sample values: {filtered_df[institute_col].unique()[:5]}")
-                    logger.info(f"Filtering for: {institutes}")
-                    
-                    def match_institute(val):
-                        val_upper = str(val).upper()
-                        for inst in institutes:
-                            if inst == "IIT":
-                                if "INDIAN INSTITUTE OF TECHNOLOGY" in val_upper:
-                                    return True
-                            elif inst == "NIT":
-                                if "NATIONAL INSTITUTE OF TECHNOLOGY" in val_upper:
-                                    return True
-                            elif inst == "IIIT":
-                                if "INDIAN INSTITUTE OF INFORMATION TECHNOLOGY" in val_upper:
-                                    return True
-                            elif inst == "GFTI":
-                                # GFTI institutes don't have a common pattern, so we'll include all non-IIT/NIT/IIIT institutes
-                                if ("INDIAN INSTITUTE OF TECHNOLOGY" not in val_upper and 
-                                    "NATIONAL INSTITUTE OF TECHNOLOGY" not in val_upper and 
-                                    "INDIAN INSTITUTE OF INFORMATION TECHNOLOGY" not in val_upper):
-                                    return True
-                        return False
-                    
-                    filtered_df = filtered_df[
-                        filtered_df[institute_col].apply(match_institute)
-                    ]
-                    logger.info(f"[INSTITUTE FILTER DEBUG] Institutes filter: {institutes}, Filtered count: {len(filtered_df)}")
-            # Branch filter
-            if 'preferred_branches' in filters and filters['preferred_branches']:
-                if 'branch' in filtered_df.columns and not filtered_df['branch'].dropna().empty:
-                    branches = [b.upper() for b in filters['preferred_branches']]
-                    filtered_df = filtered_df[
-                        filtered_df['branch'].str.upper().apply(lambda val: any(b in val for b in branches))
-                    ]
+            # Institute type, branch and quota preferences are one AND of cached bitsets
+            selection = dataset.bitmap_index.select(self._bitmap_predicates(filters, dataset))
+            if selection is not None:
+                positions = positions[BitmapIndex.contains(selection, positions)]
+            filtered_df = seat_table.take(positions)
             # City filter
-            if 'home_city' in filters and filters['home_city']:
-                if 'city' in filtered_df.columns and not filtered_df['city'].dropna().empty:
-                    city = filters['home_city'].upper()
-                    filtered_df = filtered_df[
-                        filtered_df['city'].str.upper().str.contains(city, na=False)
-                    ]
-            return filtered_df
+            if filters.get('home_city'):
+                filtered_df = filtered_df[self._contains_mask(filtered_df['city'], filters['home_city'].upper())]
         except Exception as e:
-            logger.error(f"Error applying robust filters: {str(e)}")
-            return pd.DataFrame()
+            logger.error(f"Error applying filters: {str(e)}")
+            filtered_df = seat_table.iloc[0:0]
+        record_stage('filter_mask', started, rank_window, len(filtered_df))
+        if funnel is not None:
+            funnel.update(seats=len(seat_table), rank_window=rank_window, preferences=len(filtered_df))
+        return filtered_df
+
+    def _bitmap_predicates(self, filters: Dict[str, Any], dataset: Dataset) -> Dict[str, List[int]]:
+        """Accepted codes per bitmap index dimension for the filters that use it"""
+        predicates = {}
+        if filters.get('preferred_institutes'):
+            predicates['institute_type'] = preferred_type_codes(filters['preferred_institutes'])
+        if filters.get('preferred_branches'):
+            predicates['branch'] = np.flatnonzero(
+                dataset.branch_matcher.matching_names(filters['preferred_branches'])[:-1]
+            ).tolist()
+        if filters.get('quotas'):
+            predicates['quota'] = dataset.bitmap_index.codes_for('quota', filters['quotas'])
+        return predicates
+
+    def _contains_mask(self, values: pd.Series, needle: str) -> np.ndarray:
+        """Case-insensitive literal substring match, False for missing values"""
+        return values.str.upper().str.contains(needle, regex=False, na=False).to_numpy()
 
     async def get_data_summary(self) -> Dict[str, Any]:
         """Get summary statistics of loaded data"""
-        if not self.data_cache:
-            await self.load_all_data()
+        return (await self.get_summary_payload()).data
+
+    async def get_summary_payload(self) -> JSONPayload:
+        """Summary of the current dataset, serialized and compressed once per generation"""
+        dataset = await self.ensure_loaded()
+        payload = dataset.payloads.get('data_summary')
+        if payload is None:
+            payload = JSONPayload(self._data_summary(dataset))
+            dataset.payloads['data_summary'] = payload
+        return payload
+
+    def _data_summary(self, dataset: Dataset) -> Dict[str, Any]:
+        data_cache = dataset.data_cache
         
         summary = {
-            "total_files": len(self.data_cache),
+            "total_files": len(data_cache),
             "files": {},
             "total_records": 0
         }
         
-        for file_key, df in self.data_cache.items():
+        for file_key, df in data_cache.items():
             file_info = {
                 "records": len(df),
                 "columns": list(df.columns),
-                "sample_data": df.head(2).to_dict('records') if not df.empty else []
+                "memory_bytes": table_memory_bytes(df),
+                # Missing cells become None so the sample serializes to JSON
+                "sample_data": df.head(2).astype(object).where(df.head(2).notna(), None).to_dict('records')
             }
             summary["files"][file_key] = file_info
             summary["total_records"] += len(df)
         
-        return summary
\ No newline at end of file
+        files_bytes = sum(file_info["memory_bytes"] for file_info in summary["files"].values())
+        seat_table_bytes = table_memory_bytes(dataset.seat_table)
+        summary["memory"] = {
+            "files_bytes": files_bytes,
+            # The combined table (with coordinates and derived columns) that requests read
+            "seat_table_bytes": seat_table_bytes,
+            "total_bytes": files_bytes + seat_table_bytes
+        }
+        # Cutoff years and rounds; only the default one is held in memory
+        summary["partitions"] = [
+            {
+                "year": year,
+                "round": round_no,
+                "resident": (year, round_no) == self.default_partition,
+                "files": sorted(
+                    [segment.file_key for segment in dataset.segments.values() if segment.partition == (year, round_no)]
+                    + [partition_file.file_key for partition_file in dataset.partitions.get((year, round_no), [])]
+                )
+            }
+            for year, round_no in dataset.partition_keys
+        ]
+        return summary
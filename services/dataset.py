@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import logging
+from typing import Any, Dict, List, Optional
+
+from services.geo_service import GeoService, SpatialIndex
+from services.branch_matcher import BranchMatcher
+from services.institutes import INSTITUTE_TYPES, institute_attributes
+from services.partitions import Partition, PartitionFile
+from services.payloads import JSONPayload
+from services.seat_index import BitmapIndex, RankIndex
+
+logger = logging.getLogger(__name__)
+
+
+def concat_seats(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Stack seat tables, merging the categories of categorical columns so they stay categorical"""
+    columns = {}
+    for column in frames[0].columns:
+        parts = [frame[column] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[column] = union_categoricals(parts, ignore_order=True)
+        else:
+            columns[column] = np.concatenate([part.to_numpy() for part in parts])
+    return pd.DataFrame(columns, columns=frames[0].columns)
+
+
+class Segment:
+    """One source file's seats with their rank index and resolved coordinates"""
+
+    def __init__(
+        self,
+        file_key: str,
+        signature: Optional[Dict[str, Any]],
+        seats: pd.DataFrame,
+        partition: Partition,
+        rank_index: Optional[RankIndex] = None
+    ):
+        self.file_key = file_key
+        self.signature = signature
+        self.seats = seats
+        # Cutoff year and round of every seat in the file
+        self.partition = partition
+        # The rank index only depends on the file itself, so it survives geo data changes
+        self.rank_index = rank_index if rank_index is not None else RankIndex(seats)
+        self.latitude = np.full(len(seats), np.nan)
+        self.longitude = np.full(len(seats), np.nan)
+
+    def with_signature(self, signature: Dict[str, Any]) -> "Segment":
+        """Copy of this segment under another signature of the same content (e.g. after a touch)"""
+        segment = Segment(self.file_key, signature, self.seats, self.partition, self.rank_index)
+        segment.latitude, segment.longitude = self.latitude, self.longitude
+        return segment
+
+    def with_coordinates(self, geo_service: GeoService) -> "Segment":
+        """Copy of this segment (sharing seats and rank index) with coordinates from geo_service"""
+        segment = Segment(self.file_key, self.signature, self.seats, self.partition, self.rank_index)
+        segment.latitude, segment.longitude = geo_service.resolve_cities(self.seats['city'])
+        return segment
+
+
+class Dataset:
+    """Immutable, versioned view of all loaded data.
+
+    A new Dataset is built for every reload and swapped in with a single assignment,
+    so readers that take one reference see a consistent seat table, indexes and geo
+    lookup for the whole request. Files of cutoff years and rounds that are not held
+    resident are listed in `partitions`; queries selecting them get a Dataset of their own.
+    """
+
+    def __init__(
+        self,
+        generation: int,
+        segments: List[Segment],
+        geo_service: GeoService,
+        empty_seats: pd.DataFrame,
+        geo_signature: Optional[Dict[str, Any]] = None,
+        partitions: Optional[Dict[Partition, List[PartitionFile]]] = None
+    ):
+        self._set_parts(generation, segments, geo_service, geo_signature, partitions)
+
+        if segments:
+            seat_table = concat_seats([segment.seats for segment in segments])
+            seat_table['latitude'] = np.concatenate([segment.latitude for segment in segments])
+            seat_table['longitude'] = np.concatenate([segment.longitude for segment in segments])
+            lengths = [len(segment.seats) for segment in segments]
+            seat_table['year'] = np.repeat([segment.partition[0] for segment in segments], lengths).astype(np.int16)
+            seat_table['round'] = np.repeat([segment.partition[1] for segment in segments], lengths).astype(np.int8)
+        else:
+            # No seat files: an empty table that still has the canonical schema
+            seat_table = empty_seats.assign(
+                latitude=np.empty(0),
+                longitude=np.empty(0),
+                year=np.empty(0, dtype=np.int16),
+                round=np.empty(0, dtype=np.int8)
+            )
+        # Institute type, resolved state and group code, derived once per distinct value
+        self.seat_table = pd.concat([seat_table, institute_attributes(seat_table)], axis=1)
+        # Interned branch names; rows carry their branch code for preference matching
+        self.branch_matcher = BranchMatcher(seat_table['branch'])
+        self.seat_table['branch_code'] = self.branch_matcher.codes
+        self.bitmap_index = self._build_bitmap_index(self.seat_table)
+        self.spatial_index = SpatialIndex(self.seat_table['latitude'], self.seat_table['longitude'])
+        # Serialized responses (e.g. filter options) built lazily for this generation, by name
+        self.payloads: Dict[str, JSONPayload] = {}
+
+    @classmethod
+    def attach(
+        cls,
+        generation: int,
+        segments: List[Segment],
+        geo_service: GeoService,
+        seat_table: pd.DataFrame,
+        branch_matcher: BranchMatcher,
+        bitmap_index: BitmapIndex,
+        spatial_index: SpatialIndex,
+        geo_signature: Optional[Dict[str, Any]] = None,
+        partitions: Optional[Dict[Partition, List[PartitionFile]]] = None
+    ) -> "Dataset":
+        """Dataset over an already combined seat table and its indexes, used as given.
+
+        Nothing is copied or derived again, so a table memory-mapped from a
+        SharedDatasetStore stays shared with every other process attached to it.
+        """
+        dataset = cls.__new__(cls)
+        dataset._set_parts(generation, segments, geo_service, geo_signature, partitions)
+        dataset.seat_table = seat_table
+        dataset.branch_matcher = branch_matcher
+        dataset.bitmap_index = bitmap_index
+        dataset.spatial_index = spatial_index
+        dataset.payloads = {}
+        return dataset
+
+    def _set_parts(
+        self,
+        generation: int,
+        segments: List[Segment],
+        geo_service: GeoService,
+        geo_signature: Optional[Dict[str, Any]],
+        partitions: Optional[Dict[Partition, List[PartitionFile]]]
+    ):
+        self.generation = generation
+        self.segments = {segment.file_key: segment for segment in segments}
+        self.geo_service = geo_service
+        self.geo_signature = geo_signature
+        self.partitions = partitions or {}
+        self.partition_files = {
+            partition_file.file_key: partition_file
+            for partition_files in self.partitions.values()
+            for partition_file in partition_files
+        }
+        self.offsets = np.cumsum([0] + [len(segment.seats) for segment in segments])
+
+    def _build_bitmap_index(self, seat_table: pd.DataFrame) -> BitmapIndex:
+        dimensions = {
+            'institute_type': seat_table['institute_type'].cat.codes.to_numpy().astype(np.int32),
+            'branch': seat_table['branch_code'].to_numpy()
+        }
+        labels = {'institute_type': pd.Index(INSTITUTE_TYPES).str.upper(), 'branch': self.branch_matcher.names}
+        # Category and gender are answered by the rank index together with the rank window
+        codes, uniques = pd.factorize(seat_table['quota'].str.strip().str.upper())
+        dimensions['quota'] = codes.astype(np.int32)
+        labels['quota'] = pd.Index(uniques)
+        return BitmapIndex(dimensions, labels)
+
+    @property
+    def partition_keys(self) -> List[Partition]:
+        """Every (year, round) with seat data, resident or not"""
+        return sorted({segment.partition for segment in self.segments.values()} | set(self.partitions))
+
+    @property
+    def data_cache(self) -> Dict[str, pd.DataFrame]:
+        """Parsed seat frame of every loaded file, by file key"""
+        return {file_key: segment.seats for file_key, segment in self.segments.items()}
+
+    def lookup(
+        self,
+        category: Optional[str] = None,
+        gender: Optional[str] = None,
+        min_closing_rank: Optional[int] = None,
+        max_closing_rank: Optional[int] = None,
+    ) -> np.ndarray:
+        """Sorted seat table positions in the rank window, answered by each segment's rank index"""
+        positions = [
+            segment.rank_index.lookup(category, gender, min_closing_rank, max_closing_rank) + offset
+            for segment, offset in zip(self.segments.values(), self.offsets)
+        ]
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        # Segments are laid out in order, so their sorted runs concatenate into a sorted array
+        return np.concatenate(positions)
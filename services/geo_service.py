@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+import logging
+import re
+import difflib
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Similarity cutoff for fuzzy city matches (difflib ratio)
+FUZZY_CUTOFF = 0.8
+
+_NOT_CACHED = object()
+
+# Characters left in a key after normalize()
+_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances in km from one point to arrays of points (NaN where unknown)"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeoService:
+    """City name to coordinates lookup backed by the Geo_data_INDIA_all_cities workbook"""
+
+    def __init__(self, cache_size: int = 4096):
+        self.geo_data: Dict[str, Tuple[float, float]] = {}
+        # Sorted distinct city names as written in the workbook, for the filter options
+        self.city_names: List[str] = []
+        self.location_cache = LRUCache(cache_size)
+        self._sorted_keys: List[str] = []
+        self._sorted_key_order = np.empty(0, dtype=np.int64)
+        self._keys: List[str] = []
+        self._bigram_index: Dict[str, np.ndarray] = {}
+        self._key_lengths = np.empty(0, dtype=np.int64)
+        self._char_counts = np.empty((0, len(_ALPHABET)), dtype=np.int16)
+
+    def load(self, geo_df: Optional[pd.DataFrame]):
+        """Build the lookup table and its prefix/bigram indexes from the geo workbook"""
+        geo_data = {}
+        if geo_df is not None:
+            for city, lat, lon in zip(geo_df.get('City', []), geo_df.get('Latitude', []), geo_df.get('Longitude', [])):
+                city = str(city).strip() if not pd.isna(city) else ''
+                if city and not pd.isna(lat) and not pd.isna(lon):
+                    geo_data[self.normalize(city)] = (float(lat), float(lon))
+        self.geo_data = geo_data
+        if geo_df is not None and 'City' in geo_df:
+            self.city_names = sorted({str(city).strip() for city in geo_df['City'].dropna().unique()})
+        
+        # Sorted keys turn a prefix lookup into two bisections; the original order breaks ties
+        self._keys = list(geo_data)
+        order = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+        self._sorted_keys = [self._keys[i] for i in order]
+        self._sorted_key_order = np.array(order, dtype=np.int64)
+        
+        # Padded bigrams narrow fuzzy matching down to keys sharing some text with the query
+        postings = defaultdict(list)
+        for key_id, key in enumerate(self._keys):
+            for bigram in self._bigrams(key):
+                postings[bigram].append(key_id)
+        self._bigram_index = {bigram: np.array(ids, dtype=np.int64) for bigram, ids in postings.items()}
+        self._key_lengths = np.array([len(key) for key in self._keys], dtype=np.int64)
+        self._char_counts = np.array(
+            [self._count_chars(key) for key in self._keys], dtype=np.int16
+        ).reshape(len(self._keys), len(_ALPHABET))
+        
+        self.location_cache.clear()
+        logger.info(f"Loaded {len(self.geo_data)} cities from geo_data Excel.")
+
+    def normalize(self, s):
+        return re.sub(r'[^a-z0-9]', '', s.lower().strip()) if s else ''
+
+    def _bigrams(self, key: str) -> set:
+        padded = f"^{key}$"
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+    def _count_chars(self, key: str) -> List[int]:
+        return [key.count(c) for c in _ALPHABET]
+
+    def get_coordinates(self, location: str) -> Optional[Tuple[float, float]]:
+        """Get coordinates for a city with caching and geo_data lookup, with suffix and fuzzy matching"""
+        coords = self.location_cache.get(location, _NOT_CACHED)
+        if coords is not _NOT_CACHED:
+            return coords
+        coords = self._resolve(location)
+        self.location_cache.put(location, coords)
+        return coords
+
+    def _resolve(self, location: str) -> Optional[Tuple[float, float]]:
+        # Use only the city name for lookup
+        city = location.split(',')[0] if ',' in location else location
+        norm_city = self.normalize(city)
+        if not norm_city:
+            return None
+        coords = self.geo_data.get(norm_city)
+        if coords:
+            return coords
+        # Suffix handling: the first key (in workbook order) that starts with norm_city
+        key = self._prefix_match(norm_city)
+        if key:
+            logger.debug(f"Geo_data SUFFIX MATCH for city '{city}' (normalized: '{norm_city}') -> {key}")
+            return self.geo_data[key]
+        # Fuzzy matching: difflib over the candidates sharing a bigram with norm_city
+        key = self._fuzzy_match(norm_city)
+        if key:
+            logger.debug(f"Geo_data FUZZY MATCH for city '{city}' (normalized: '{norm_city}') -> {key}")
+            return self.geo_data[key]
+        logger.debug(f"Geo_data MISS for city '{city}' (normalized: '{norm_city}')")
+        return None
+
+    def _prefix_match(self, prefix: str) -> Optional[str]:
+        lo = bisect_left(self._sorted_keys, prefix)
+        # Keys only contain [a-z0-9], so '{' sorts after every possible continuation
+        hi = bisect_left(self._sorted_keys, prefix + '{', lo)
+        if lo == hi:
+            return None
+        return self._keys[self._sorted_key_order[lo:hi].min()]
+
+    def _fuzzy_match(self, norm_city: str) -> Optional[str]:
+        postings = [self._bigram_index[b] for b in self._bigrams(norm_city) if b in self._bigram_index]
+        if not postings:
+            return None
+        candidates = np.unique(np.concatenate(postings))
+        # Shared character counts bound difflib's ratio from above (its quick_ratio),
+        # so candidates that cannot reach the cutoff are dropped without running difflib
+        query_counts = np.array(self._count_chars(norm_city), dtype=np.int16)
+        shared = np.minimum(self._char_counts[candidates], query_counts).sum(axis=1)
+        reachable = 2 * shared >= FUZZY_CUTOFF * (self._key_lengths[candidates] + len(norm_city))
+        close_matches = difflib.get_close_matches(
+            norm_city, [self._keys[i] for i in candidates[reachable]], n=1, cutoff=FUZZY_CUTOFF
+        )
+        return close_matches[0] if close_matches else None
+
+    def resolve_cities(self, cities: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Resolve a column of city names to latitude/longitude arrays, once per distinct city"""
+        codes, uniques = pd.factorize(cities)
+        lats = np.full(len(uniques) + 1, np.nan)
+        lons = np.full(len(uniques) + 1, np.nan)
+        for i, city in enumerate(uniques):
+            coords = self.get_coordinates(str(city))
+            if coords:
+                lats[i], lons[i] = coords
+        # Missing cities get code -1, which picks the trailing NaN
+        return lats[codes], lons[codes]
+
+
+class SpatialIndex:
+    """Uniform latitude/longitude grid over seat coordinates for radius and nearest-neighbour queries"""
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float = 1.0):
+        self.cell_deg = cell_deg
+        self.n_cols = int(np.ceil(360 / cell_deg))
+        self.n_rows = int(np.ceil(180 / cell_deg))
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        positions = np.flatnonzero(valid)
+        cell_ids = self._row(lats[valid]) * self.n_cols + self._col(lons[valid])
+        # Points sorted by cell id, so any run of cells in one grid row is one contiguous slice
+        order = np.argsort(cell_ids, kind='stable')
+        self.cell_ids = cell_ids[order]
+        self.positions = positions[order]
+        self.lats = lats[valid][order]
+        self.lons = lons[valid][order]
+        logger.info(f"Built spatial index over {len(self.positions)} seats in {len(np.unique(self.cell_ids))} grid cells")
+
+    @classmethod
+    def from_arrays(
+        cls,
+        cell_ids: np.ndarray,
+        positions: np.ndarray,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        cell_deg: float = 1.0
+    ) -> "SpatialIndex":
+        """Index over points already sorted by cell id, used as given"""
+        index = cls.__new__(cls)
+        index.cell_deg = cell_deg
+        index.n_cols = int(np.ceil(360 / cell_deg))
+        index.n_rows = int(np.ceil(180 / cell_deg))
+        index.cell_ids, index.positions, index.lats, index.lons = cell_ids, positions, lats, lons
+        return index
+
+    def _row(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90) / self.cell_deg), 0, self.n_rows - 1).astype(np.int64)
+
+    def _col(self, lons):
+        return np.floor(((np.asarray(lons) + 180) % 360) / self.cell_deg).astype(np.int64) % self.n_cols
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (seat positions, distances) within radius_km, nearest first"""
+        dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        max_abs_lat = max(abs(lat_lo), abs(lat_hi))
+        if max_abs_lat >= 89.9 or radius_km >= np.pi * EARTH_RADIUS_KM / 2:
+            dlon = 180.0
+        else:
+            dlon = min(180.0, np.degrees(radius_km / (EARTH_RADIUS_KM * np.cos(np.radians(max_abs_lat)))))
+        if dlon >= 180.0:
+            col_ranges = [(0, self.n_cols - 1)]
+        else:
+            col_lo, col_hi = int(self._col(lon - dlon)), int(self._col(lon + dlon))
+            # The longitude window may wrap around the antimeridian
+            col_ranges = [(col_lo, col_hi)] if col_lo <= col_hi else [(col_lo, self.n_cols - 1), (0, col_hi)]
+        slices = []
+        for row in range(int(self._row(lat_lo)), int(self._row(lat_hi)) + 1):
+            for col_lo, col_hi in col_ranges:
+                start = np.searchsorted(self.cell_ids, row * self.n_cols + col_lo, side='left')
+                end = np.searchsorted(self.cell_ids, row * self.n_cols + col_hi, side='right')
+                if start < end:
+                    slices.append(np.arange(start, end))
+        if not slices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = np.concatenate(slices)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        within = distances <= radius_km
+        candidates, distances = candidates[within], distances[within]
+        order = np.argsort(distances, kind='stable')
+        return self.positions[candidates[order]], distances[order]
+
+    def nearest(self, lat: float, lon: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (seat positions, distances) of the k nearest seats, nearest first"""
+        radius_km = self.cell_deg * 111.0
+        while True:
+            positions, distances = self.within_radius(lat, lon, radius_km)
+            # Everything inside the searched radius is exact, so k hits there are the k nearest
+            if len(positions) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                return positions[:k], distances[:k]
+            radius_km *= 2
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.cache import LRUCache
+from services.data_service import DataService, GEO_DATA_FILE_KEY, RANK_COLUMNS, parse_source_file
+
+logger = logging.getLogger(__name__)
+
+# Columns an uploaded seat file must provide (after alias resolution) to be usable
+REQUIRED_SEAT_COLUMNS = ['institute', 'branch', 'category', 'gender', 'closing_rank']
+REQUIRED_GEO_COLUMNS = ['City', 'Latitude', 'Longitude']
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+
+class IngestJobManager:
+    """Streams uploaded Excel files to disk and ingests them as background jobs.
+
+    An upload is written in chunks to a hidden temp file next to the data files, so the
+    request never holds the whole file in memory. A background job then validates the
+    schema, moves the file into place with an atomic rename and reloads the data;
+    its progress is kept by job id for the status endpoint.
+    """
+
+    def __init__(
+        self,
+        data_service: DataService,
+        max_upload_bytes: int = 50 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        max_jobs: int = 100
+    ):
+        self.data_service = data_service
+        self.max_upload_bytes = max_upload_bytes
+        self.chunk_size = chunk_size
+        # Finished jobs are forgotten least-recently-viewed first
+        self.jobs = LRUCache(max_jobs)
+        self._tasks = set()
+
+    async def submit(self, filename: str, upload) -> Dict[str, Any]:
+        """Stream `upload` (anything with an async read(size)) to disk and start its ingestion job"""
+        job_id = uuid.uuid4().hex
+        target_path = self.data_service.data_folder_path / filename
+        temp_path = self.data_service.data_folder_path / f".upload-{job_id}.part"
+        job = {
+            'job_id': job_id,
+            'filename': filename,
+            'state': 'receiving',
+            'bytes': 0,
+            'rows': None,
+            'rejected_rows': None,
+            'error': None,
+            'created_at': time.time(),
+            'timings': {}
+        }
+        self.jobs.put(job_id, job)
+
+        started = time.perf_counter()
+        try:
+            with open(temp_path, 'wb') as buffer:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    job['bytes'] += len(chunk)
+                    if job['bytes'] > self.max_upload_bytes:
+                        raise UploadTooLargeError(f"Upload exceeds {self.max_upload_bytes} bytes")
+                    await asyncio.to_thread(buffer.write, chunk)
+        except Exception as e:
+            temp_path.unlink(missing_ok=True)
+            job.update(state='failed', error=str(e))
+            raise
+        job['timings']['upload_seconds'] = round(time.perf_counter() - started, 3)
+
+        job['state'] = 'queued'
+        task = asyncio.create_task(self._run(job, temp_path, target_path))
+        # Keep a reference so the task is not garbage collected before it finishes
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current status of a job, including data load progress while it is loading"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        status = dict(job)
+        if job['state'] == 'loading':
+            load_status = self.data_service.load_status
+            status['progress'] = {
+                'files_done': load_status.get('files_done', 0),
+                'files_total': load_status.get('files_total', 0)
+            }
+        return status
+
+    async def _run(self, job: Dict[str, Any], temp_path: Path, target_path: Path):
+        file_key = target_path.stem.lower()
+        try:
+            job['state'] = 'validating'
+            started = time.perf_counter()
+            df = await asyncio.to_thread(parse_source_file, str(temp_path), file_key)
+            errors = self._validate(df, file_key)
+            job['timings']['validate_seconds'] = round(time.perf_counter() - started, 3)
+            if errors:
+                raise ValueError('; '.join(errors))
+            job['rows'] = len(df)
+            job['rejected_rows'] = self._count_rejected(df, file_key)
+
+            # The rename is atomic, so a reload never sees a partially written file
+            os.replace(temp_path, target_path)
+            # The file was just parsed, so seed its snapshot and let the reload skip parsing it again
+            await asyncio.to_thread(self.data_service.save_snapshot, target_path, file_key, df)
+
+            job['state'] = 'loading'
+            started = time.perf_counter()
+            await self.data_service.load_all_data()
+            job['timings']['load_seconds'] = round(time.perf_counter() - started, 3)
+            job.update(state='completed', generation=self.data_service.generation, finished_at=time.time())
+            logger.info(f"Ingested {target_path.name}: {job['rows']} rows, {job['rejected_rows']} rejected")
+        except Exception as e:
+            job.update(state='failed', error=str(e), finished_at=time.time())
+            logger.error(f"Ingestion of {target_path.name} failed: {str(e)}")
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def _validate(self, df: pd.DataFrame, file_key: str) -> List[str]:
+        """Schema problems that make the file unusable, empty if it is fine"""
+        if file_key == GEO_DATA_FILE_KEY:
+            missing = [col for col in REQUIRED_GEO_COLUMNS if col not in df.columns]
+            return [f"Missing columns: {', '.join(missing)}"] if missing else []
+        errors = []
+        if df.empty:
+            errors.append("File contains no rows")
+        # Columns with no value in any row were missing from the sheet under every accepted name
+        missing = [
+            col for col in REQUIRED_SEAT_COLUMNS
+            if not (df[col] > 0 if col in RANK_COLUMNS else df[col].notna()).any()
+        ]
+        if missing:
+            errors.append(f"Missing columns: {', '.join(missing)}")
+        return errors
+
+    def _count_rejected(self, df: pd.DataFrame, file_key: str) -> int:
+        """Rows that can never be recommended: no usable closing rank"""
+        if file_key == GEO_DATA_FILE_KEY:
+            return int(df[REQUIRED_GEO_COLUMNS].isna().any(axis=1).sum())
+        return int(np.count_nonzero(df['closing_rank'].to_numpy() <= 0))
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+IIT_NAME = "INDIAN INSTITUTE OF TECHNOLOGY"
+NIT_NAME = "NATIONAL INSTITUTE OF TECHNOLOGY"
+IIIT_NAME = "INDIAN INSTITUTE OF INFORMATION TECHNOLOGY"
+
+# Categories of the seat table's institute_type column; 'Other' marks a missing institute name
+INSTITUTE_TYPES = ['IIT', 'NIT', 'IIIT', 'GFTI', 'Other']
+
+# Columns (after state resolution) whose normalized values identify one recommendation
+GROUP_COLUMNS = ['institute', 'branch', 'category', 'gender', 'resolved_state', 'city', 'year', 'round']
+
+IIT_STATE_MAP = {
+    'IIT MADRAS': 'Tamil Nadu',
+    'IIT BOMBAY': 'Maharashtra',
+    'IIT DELHI': 'Delhi',
+    'IIT KANPUR': 'Uttar Pradesh',
+    'IIT KHARAGPUR': 'West Bengal',
+    'IIT ROORKEE': 'Uttarakhand',
+    'IIT GUWAHATI': 'Assam',
+    'IIT HYDERABAD': 'Telangana',
+    'IIT INDORE': 'Madhya Pradesh',
+    'IIT MANDI': 'Himachal Pradesh',
+    'IIT PATNA': 'Bihar',
+    'IIT ROPAR': 'Punjab',
+    'IIT BHUBANESWAR': 'Odisha',
+    'IIT GANDHINAGAR': 'Gujarat',
+    'IIT JODHPUR': 'Rajasthan',
+    'IIT VARANASI': 'Uttar Pradesh',
+    'IIT PALAKKAD': 'Kerala',
+    'IIT TIRUPATI': 'Andhra Pradesh',
+    'IIT DHANBAD': 'Jharkhand',
+    'IIT BHILAI': 'Chhattisgarh',
+    'IIT GOA': 'Goa',
+    'IIT JAMMU': 'Jammu and Kashmir',
+    'IIT DHARWAD': 'Karnataka'
+}
+
+
+def determine_institute_type(institute_name: str) -> str:
+    """Determine institute type from the institute name (robust, non-overlapping)"""
+    if not institute_name:
+        return 'Other'
+    institute_name = str(institute_name).upper()
+
+    # Use simple string matching based on actual institute names
+    if IIIT_NAME in institute_name:
+        return 'IIIT'
+    elif IIT_NAME in institute_name:
+        return 'IIT'
+    elif NIT_NAME in institute_name:
+        return 'NIT'
+    else:
+        # All other institutes are considered GFTI
+        return 'GFTI'
+
+
+def extract_state_from_institute_name(institute_name: str) -> str:
+    """Extract state from institute name when state field is missing"""
+    if not institute_name:
+        return 'Unknown'
+
+    institute_name = str(institute_name).upper()
+
+    # Check for exact matches first
+    for iit_name, state in IIT_STATE_MAP.items():
+        if iit_name in institute_name:
+            return state
+
+    # Check for partial matches
+    for iit_name, state in IIT_STATE_MAP.items():
+        if any(word in institute_name for word in iit_name.split()):
+            return state
+
+    return 'Unknown'
+
+
+def preferred_type_codes(preferred_institutes) -> List[int]:
+    """Codes in INSTITUTE_TYPES accepted by preferences such as ['IIT', 'GFTI']"""
+    wanted = set()
+    for pref_institute in preferred_institutes:
+        pref_institute = pref_institute.upper()
+        if pref_institute in ('IIT', 'NIT', 'IIIT'):
+            wanted.add(INSTITUTE_TYPES.index(pref_institute))
+        elif pref_institute == 'GFTI':
+            # A missing name matches none of the IIT/NIT/IIIT patterns, so it counts as GFTI
+            wanted.update((INSTITUTE_TYPES.index('GFTI'), INSTITUTE_TYPES.index('Other')))
+    return sorted(wanted)
+
+
+def institute_type_mask(df: pd.DataFrame, preferred_institutes) -> np.ndarray:
+    """Rows whose institute_type is one of the preferred types ('IIT', 'NIT', 'IIIT', 'GFTI')"""
+    return np.isin(df['institute_type'].cat.codes.to_numpy(), preferred_type_codes(preferred_institutes))
+
+
+def _text_codes(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Codes into display labels of a text column; missing values get the trailing 'Unknown' label"""
+    codes, uniques = pd.factorize(values)
+    labels = np.append(np.asarray(uniques, dtype=object).astype(str), 'Unknown').astype(object)
+    return np.where(codes < 0, len(uniques), codes), labels
+
+
+def _normalized(codes: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Codes that are equal when labels match after stripping and upper-casing"""
+    label_codes, _ = pd.factorize(pd.Index(labels).str.strip().str.upper())
+    return label_codes[codes]
+
+
+def institute_attributes(seat_table: pd.DataFrame) -> pd.DataFrame:
+    """Derived per-seat columns, each computed once per distinct value rather than per row:
+
+    - institute_type: categorical over INSTITUTE_TYPES
+    - resolved_state: categorical state, taken from the institute name where the state is missing
+    - group_code: int32 id shared by seats that form one recommendation (equal GROUP_COLUMNS)
+    """
+    institute_codes, institute_labels = _text_codes(seat_table['institute'])
+    type_by_institute = np.array(
+        [determine_institute_type(name) for name in institute_labels[:-1]] + ['Other'], dtype=object
+    )
+    institute_type = pd.Categorical.from_codes(
+        pd.Index(INSTITUTE_TYPES).get_indexer(type_by_institute)[institute_codes], categories=INSTITUTE_TYPES
+    )
+
+    # Missing states are resolved per institute: codes past the state labels index extracted states
+    state_codes, state_labels = _text_codes(seat_table['state'])
+    extracted_states = np.array([extract_state_from_institute_name(name) for name in institute_labels], dtype=object)
+    missing_state = (state_labels == 'Unknown')[state_codes]
+    resolved_codes = np.where(missing_state, len(state_labels) + institute_codes, state_codes)
+    resolved_labels = np.concatenate([state_labels, extracted_states])
+    # Only labels that occur become categories
+    used_codes, resolved_codes = np.unique(resolved_codes, return_inverse=True)
+    resolved_labels = resolved_labels[used_codes]
+    category_codes, categories = pd.factorize(resolved_labels)
+    resolved_state = pd.Categorical.from_codes(category_codes[resolved_codes], categories=categories)
+
+    group_keys = {
+        'institute': _normalized(institute_codes, institute_labels),
+        'resolved_state': _normalized(resolved_codes, resolved_labels)
+    }
+    for column in ['branch', 'category', 'gender', 'city']:
+        group_keys[column] = _normalized(*_text_codes(seat_table[column]))
+    # Seats of different cutoff years or rounds are never merged into one recommendation
+    for column in ['year', 'round']:
+        group_keys[column] = seat_table[column].to_numpy()
+    group_keys = pd.DataFrame({column: group_keys[column] for column in GROUP_COLUMNS})
+    group_code = group_keys.groupby(GROUP_COLUMNS, sort=False).ngroup().to_numpy(dtype=np.int32)
+
+    return pd.DataFrame({
+        'institute_type': institute_type,
+        'resolved_state': resolved_state,
+        'group_code': group_code
+    }, index=seat_table.index)
@@ -0,0 +1,59 @@
+import re
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+# (cutoff year, JoSAA round) whose seats one source file holds
+Partition = Tuple[int, int]
+
+YEAR_FOLDER_PATTERN = re.compile(r'^\d{4}$')
+ROUND_FOLDER_PATTERN = re.compile(r'^round[_-]?(\d+)$', re.IGNORECASE)
+
+
+class SourceFile(NamedTuple):
+    path: Path
+    file_key: str
+    partition: Partition
+
+
+class PartitionFile(NamedTuple):
+    """A loaded source file of a partition that is not kept resident.
+
+    seats is only set when there is no snapshot store to read it back from; otherwise the
+    table lives on disk until a query selects the partition.
+    """
+    file_key: str
+    path: Path
+    signature: Dict[str, Any]
+    seats: Optional[pd.DataFrame]
+
+
+def partition_file_key(partition: Partition, stem: str) -> str:
+    """File key of a file in a year/round folder, prefixed so equal names in other partitions never clash"""
+    year, round_no = partition
+    return f"{year}_round{round_no}_{stem}".lower()
+
+
+def discover_source_files(data_folder: Path, default_partition: Partition) -> List[SourceFile]:
+    """Excel files of the data folder with the partition each belongs to.
+
+    Files directly in the folder (including the geo workbook) belong to the default
+    partition, data/<year>/round_<n>/*.xlsx to round n of that year and
+    data/<year>/*.xlsx to the default round of that year.
+    """
+    files = [SourceFile(path, path.stem.lower(), default_partition) for path in sorted(data_folder.glob("*.xlsx"))]
+    for year_folder in sorted(data_folder.iterdir()):
+        if not year_folder.is_dir() or not YEAR_FOLDER_PATTERN.match(year_folder.name):
+            continue
+        year = int(year_folder.name)
+        folders = [(year_folder, default_partition[1])]
+        for round_folder in sorted(year_folder.iterdir()):
+            match = ROUND_FOLDER_PATTERN.match(round_folder.name)
+            if round_folder.is_dir() and match:
+                folders.append((round_folder, int(match.group(1))))
+        for folder, round_no in folders:
+            for path in sorted(folder.glob("*.xlsx")):
+                partition = (year, round_no)
+                files.append(SourceFile(path, partition_file_key(partition, path.stem), partition))
+    return files
@@ -0,0 +1,31 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+
+class JSONPayload:
+    """A response body serialized, compressed and tagged once, then served as is.
+
+    The strong ETag is a hash of the JSON bytes; the gzip representation gets its own
+    tag, since its bytes differ. Both stay valid for as long as the payload is reused,
+    which is one data generation for the payloads a Dataset keeps.
+    """
+
+    def __init__(self, data: Any):
+        self.data = data
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # mtime=0 makes every worker produce the same bytes for the same gzip tag
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header names either representation, so 304 can be returned"""
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        # Weak comparison, as RFC 9110 specifies for If-None-Match
+        tags |= {tag[2:] for tag in tags if tag.startswith('W/')}
+        return '*' in tags or self.etag in tags or self.gzip_etag in tags
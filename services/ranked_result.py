@@ -0,0 +1,61 @@
+import numpy as np
+from typing import Dict, List
+
+from models.college_response import CollegeResponse
+
+
+class RankedResult:
+    """Every recommendation group of one query in ranked order, kept as flat arrays.
+
+    Group fields are arrays indexed by rank; quota options of all groups are stored
+    back to back (sorted by closing rank within a group), with `offsets[i]:offsets[i + 1]`
+    selecting those of the group ranked i. Pages are built from slices, so serving a
+    later page does no filtering, scoring or grouping.
+    """
+
+    def __init__(
+        self,
+        generation: int,
+        groups: Dict[str, np.ndarray],
+        quota_options: Dict[str, np.ndarray],
+        offsets: np.ndarray
+    ):
+        self.generation = generation
+        self.groups = groups
+        self.quota_options = quota_options
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def page(self, offset: int, size: int) -> List[CollegeResponse]:
+        """Responses for the groups ranked offset .. offset + size - 1"""
+        groups = self.groups
+        quotas = self.quota_options
+        recommendations = []
+        for rank in range(offset, min(offset + size, len(self))):
+            lo, hi = self.offsets[rank], self.offsets[rank + 1]
+            institute_name = groups['institute'][rank]
+            distance = groups['distance_km'][rank]
+            recommendations.append(CollegeResponse(
+                institute_name=institute_name,
+                college_name=institute_name,
+                branch=groups['branch'][rank],
+                quota_options=[
+                    {'quota': quota, 'opening_rank': int(opening_rank), 'closing_rank': int(closing_rank)}
+                    for quota, opening_rank, closing_rank in zip(
+                        quotas['quota'][lo:hi], quotas['opening_rank'][lo:hi], quotas['closing_rank'][lo:hi]
+                    )
+                ],
+                category=groups['category'][rank],
+                gender=groups['gender'][rank],
+                state=groups['state'][rank],
+                city=groups['city'][rank],
+                distance_km=None if np.isnan(distance) else distance,
+                institute_type=groups['institute_type'][rank],
+                recommendation_score=round(float(groups['score'][rank]), 2),
+                cutoff_year=str(groups['cutoff_year'][rank]),
+                cutoff_round=int(groups['cutoff_round'][rank]),
+                additional_info={}
+            ))
+        return recommendations
@@ -1,462 +1,749 @@
 import pandas as pd
+import numpy as np
 import logging
-from typing import List, Dict, Any
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
+from typing import List, Dict, Any, Optional, Tuple, Union, AsyncIterator
 import asyncio
-import re
-import difflib
+import base64
+import binascii
+import hashlib
+import time
+from collections import defaultdict
 
 from models.student_input import StudentInput
 from models.college_response import CollegeResponse
-from services.data_service import DataService
+from services.data_service import DataService, text_values
+from services.dataset import Dataset
+from services.scoring_engine import ScoringEngine
+from services.geo_service import haversine_km
+from services.cache import LRUCache
+from services.compute_pool import ComputePool
+from services.ranked_result import RankedResult
+from services.metrics import RECOMMENDATION_SECONDS, record_stage
 
 logger = logging.getLogger(__name__)
 
+# Students per batch compute job: filtering is shared within a job, results stream per job
+BATCH_CHUNK_SIZE = 32
+
+class CursorExpiredError(Exception):
+    """Raised when a page cursor refers to a ranking that is no longer retained or was computed on older data"""
+
+
+def encode_cursor(token: str, offset: int, page_size: int) -> str:
+    """Opaque page cursor: the retained ranking's token, the next offset and the page size"""
+    return base64.urlsafe_b64encode(f"{token}:{offset}:{page_size}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        token, offset, page_size = raw.split(':')
+        offset, page_size = int(offset), int(page_size)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not token or offset < 0 or page_size < 1:
+        raise ValueError("Invalid cursor")
+    return token, offset, page_size
+
+
+# Service used by compute pool worker processes, built once per worker by _init_worker
+_worker_service: Optional["RecommendationService"] = None
+
+
+def _init_worker(
+    data_folder_path: str,
+    snapshot_folder_path: Optional[str],
+    max_recommendations: int,
+    default_partition: Tuple[int, int],
+    shared_dataset_path: Optional[str] = None,
+    generation: int = 0
+):
+    """Load the dataset in a compute worker process (attached when shared, else from valid snapshots)"""
+    global _worker_service
+    data_service = DataService(
+        data_folder_path,
+        snapshot_folder_path=snapshot_folder_path,
+        ingest_workers=1,
+        default_partition=default_partition,
+        shared_dataset_path=shared_dataset_path
+    )
+    dataset = asyncio.run(data_service.ensure_loaded())
+    if generation and not shared_dataset_path:
+        # The worker's own load count means nothing to callers; it serves the parent's generation
+        dataset.generation = generation
+    _worker_service = RecommendationService(data_service, max_recommendations=max_recommendations)
+
+
+def _compute_in_worker(student_input: StudentInput) -> List[CollegeResponse]:
+    return _worker_service.compute_recommendations(student_input)
+
+
+def _partition_in_worker(students: List[StudentInput]) -> List[Union[List[CollegeResponse], Exception]]:
+    return _worker_service.compute_partition(students)
+
+
+def _ranked_in_worker(student_input: StudentInput) -> Optional[RankedResult]:
+    return _worker_service.compute_ranked(student_input)
+
+
+def _explain_in_worker(student_input: StudentInput) -> Tuple[List[CollegeResponse], Dict[str, Any]]:
+    explain = {}
+    return _worker_service.compute_recommendations(student_input, explain=explain), explain
+
+
 class RecommendationService:
-    def __init__(self, data_service: DataService):
+    def __init__(
+        self,
+        data_service: DataService,
+        max_recommendations: int = 50,
+        cache_size: int = 1024,
+        cache_ttl_seconds: float = 300,
+        compute_pool: Optional[ComputePool] = None,
+        ranked_cache_size: int = 256
+    ):
         self.data_service = data_service
-        self.geocoder = Nominatim(user_agent="jee_college_recommender", timeout=30)
-        self.location_cache = {}
-        # Load geo_data Excel for fast lookup using only city name
-        self.geo_data = {}
-        try:
-            geo_df = pd.read_excel('data/Geo_data_INDIA_all_cities.xlsx')
-            for _, row in geo_df.iterrows():
-                city = str(row.get('City', '')).strip()
-                lat = row.get('Latitude')
-                lon = row.get('Longitude')
-                if city and not pd.isna(lat) and not pd.isna(lon):
-                    norm_city = self.normalize(city)
-                    self.geo_data[norm_city] = (lat, lon)
-            logger.info(f"Loaded {len(self.geo_data)} cities from geo_data Excel.")
-            # Log a sample of keys
-            logger.info(f"Sample geo_data keys: {list(self.geo_data.keys())[:10]}")
-        except Exception as e:
-            logger.error(f"Failed to load geo_data Excel: {e}")
+        self.max_recommendations = max_recommendations
+        self.scoring_engine = ScoringEngine()
+        self.result_cache = LRUCache(cache_size, ttl=cache_ttl_seconds)
+        # Full rankings retained for paginated queries, by token
+        self.ranked_cache = LRUCache(ranked_cache_size, ttl=cache_ttl_seconds)
+        self._cache_generation = data_service.generation
+        # Without a pool the pipeline runs inline (used inside the pool's own workers)
+        self.compute_pool = compute_pool
+        if compute_pool and compute_pool.mode == "process":
+            compute_pool.initializer = _init_worker
+            compute_pool.initargs = self._worker_initargs()
+
+    def _worker_initargs(self) -> Tuple:
+        snapshot_store = self.data_service.snapshot_store
+        shared_store = self.data_service.shared_store
+        return (
+            str(self.data_service.data_folder_path),
+            str(snapshot_store.folder_path) if snapshot_store else None,
+            self.max_recommendations,
+            self.data_service.default_partition,
+            str(shared_store.folder_path) if shared_store else None,
+            self.data_service.generation
+        )
 
     async def get_recommendations(self, student_input: StudentInput) -> List[CollegeResponse]:
-        """Get college recommendations based on student preferences"""
+        """Get college recommendations based on student preferences, served from cache when possible"""
+        started = time.perf_counter()
+        # One dataset reference for the whole request, so a concurrent reload cannot mix versions
+        dataset = await self.data_service.ensure_loaded()
+        generation = self._sync_generation(dataset)
+        
+        # The generation is part of the key so a result finishing after a reload is never reused
+        cache_key = (generation, self._cache_key(student_input))
+        recommendations = self.result_cache.get(cache_key)
+        cache_outcome = 'hit'
+        if recommendations is None:
+            cache_outcome = 'miss'
+            recommendations = await self._run_compute(student_input, dataset)
+            self.result_cache.put(cache_key, recommendations)
+        RECOMMENDATION_SECONDS.observe(time.perf_counter() - started, cache=cache_outcome)
+        return recommendations
+
+    def _sync_generation(self, dataset: Dataset) -> int:
+        """Drop results computed against an older dataset, wholesale, once a reload is seen"""
+        generation = dataset.generation
+        if self._cache_generation != generation:
+            self.result_cache.clear()
+            self.ranked_cache.clear()
+            self._cache_generation = generation
+            # Worker processes hold their own copy of the data, so they are replaced too
+            if self.compute_pool and self.compute_pool.mode == "process":
+                self.compute_pool.reset(self._worker_initargs())
+        return generation
+
+    async def get_first_page(self, student_input: StudentInput, page_size: int) -> Dict[str, Any]:
+        """First page of the complete ranking for a request; the ranking is retained for later pages"""
+        dataset = await self.data_service.ensure_loaded()
+        generation = self._sync_generation(dataset)
+        
+        # max_results does not change the ranking, only where the non-paginated list stops
+        key = (generation, self._cache_key(student_input)[:-1])
+        token = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+        ranked = self.ranked_cache.get(token)
+        if ranked is None:
+            if self.compute_pool is None:
+                ranked = self.compute_ranked(student_input, dataset)
+            elif self.compute_pool.mode == "process":
+                ranked = await self.compute_pool.run(_ranked_in_worker, student_input)
+            else:
+                ranked = await self.compute_pool.run(self.compute_ranked, student_input, dataset)
+            self.ranked_cache.put(token, ranked)
+        return self._page(token, ranked, 0, page_size)
+    
+    async def get_page(self, cursor: str) -> Dict[str, Any]:
+        """Page of a retained ranking named by a cursor from an earlier page"""
+        token, offset, page_size = decode_cursor(cursor)
+        dataset = await self.data_service.ensure_loaded()
+        self._sync_generation(dataset)
+        ranked = self.ranked_cache.get(token)
+        if ranked is None or ranked.generation != dataset.generation:
+            raise CursorExpiredError("Cursor has expired, request the first page again")
+        return self._page(token, ranked, offset, page_size)
+    
+    def _page(self, token: str, ranked: RankedResult, offset: int, page_size: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        recommendations = ranked.page(offset, page_size)
+        record_stage('response', started, len(ranked), len(recommendations))
+        next_offset = offset + page_size
+        return {
+            'recommendations': recommendations,
+            'total': len(ranked),
+            'offset': offset,
+            'next_cursor': encode_cursor(token, next_offset, page_size) if next_offset < len(ranked) else None
+        }
+
+    async def stream_batch(self, students: List[StudentInput]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {'index', 'recommendations'} (or {'index', 'error'}) per student as results complete.
+
+        Cached results are yielded first. The rest are grouped by partition key, sorted by
+        rank and computed in chunks of BATCH_CHUNK_SIZE, each chunk filtering its seats once.
+        """
+        dataset = await self.data_service.ensure_loaded()
+        generation = self._sync_generation(dataset)
+        
+        partitions = defaultdict(list)
+        for index, student_input in enumerate(students):
+            recommendations = self.result_cache.get((generation, self._cache_key(student_input)))
+            if recommendations is not None:
+                yield {'index': index, 'recommendations': recommendations}
+            else:
+                partitions[self._partition_key(student_input)].append(index)
+        
+        chunks = []
+        for indices in partitions.values():
+            # Neighbouring ranks share most of their rank window
+            indices.sort(key=lambda index: students[index].rank)
+            chunks.extend(indices[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(indices), BATCH_CHUNK_SIZE))
+        
+        # Leave room in the compute queue for other requests while a large batch runs
+        slots = asyncio.Semaphore(self.compute_pool.workers if self.compute_pool else 1)
+        tasks = [
+            asyncio.create_task(self._run_partition([students[index] for index in chunk], dataset, slots))
+            for chunk in chunks
+        ]
+        chunk_by_task = dict(zip(tasks, chunks))
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    chunk = chunk_by_task[task]
+                    try:
+                        results = task.result()
+                    except Exception as e:
+                        logger.error(f"Error generating batch recommendations: {str(e)}")
+                        for index in chunk:
+                            yield {'index': index, 'error': str(e) or type(e).__name__}
+                        continue
+                    for index, recommendations in zip(chunk, results):
+                        if isinstance(recommendations, Exception):
+                            # A failed student is reported, never cached as "no colleges"
+                            yield {'index': index, 'error': str(recommendations) or type(recommendations).__name__}
+                            continue
+                        self.result_cache.put((generation, self._cache_key(students[index])), recommendations)
+                        yield {'index': index, 'recommendations': recommendations}
+        finally:
+            # The client may disconnect mid-stream; don't leave chunks queued for nobody
+            for task in pending:
+                task.cancel()
+
+    async def _run_partition(
+        self,
+        students: List[StudentInput],
+        dataset: Dataset,
+        slots: asyncio.Semaphore
+    ) -> List[Union[List[CollegeResponse], Exception]]:
+        async with slots:
+            if self.compute_pool is None:
+                return self.compute_partition(students, dataset)
+            if self.compute_pool.mode == "process":
+                return await self.compute_pool.run(_partition_in_worker, students)
+            return await self.compute_pool.run(self.compute_partition, students, dataset)
+
+    async def explain_recommendations(self, student_input: StudentInput) -> Tuple[List[CollegeResponse], Dict[str, Any]]:
+        """Recommendations with per-item score breakdowns, plus the filter funnel (never cached)"""
+        dataset = await self.data_service.ensure_loaded()
+        self._sync_generation(dataset)
+        if self.compute_pool is None:
+            explain = {}
+            return self.compute_recommendations(student_input, dataset, explain), explain
+        if self.compute_pool.mode == "process":
+            return await self.compute_pool.run(_explain_in_worker, student_input)
+        explain = {}
+        recommendations = await self.compute_pool.run(self.compute_recommendations, student_input, dataset, explain)
+        return recommendations, explain
+
+    async def _run_compute(self, student_input: StudentInput, dataset: Dataset) -> List[CollegeResponse]:
+        if self.compute_pool is None:
+            return self.compute_recommendations(student_input, dataset)
+        if self.compute_pool.mode == "process":
+            return await self.compute_pool.run(_compute_in_worker, student_input)
+        return await self.compute_pool.run(self.compute_recommendations, student_input, dataset)
+
+    def _cache_key(self, student_input: StudentInput) -> Tuple:
+        """Canonical form of a request: fields that cannot change the result are normalized away"""
+        category = student_input.category.value
+        return (
+            student_input.rank,
+            'OPEN' if category == 'GENERAL' else category,
+            student_input.gender.value,
+            (student_input.home_city or '').strip().casefold(),
+            (student_input.home_state or '').strip().casefold(),
+            tuple(sorted({inst.upper() for inst in student_input.preferred_institutes})),
+            tuple(sorted({branch.upper() for branch in student_input.preferred_branches})),
+            student_input.max_distance_km or None,
+            student_input.max_closing_rank,
+            self._quotas_key(student_input),
+            self._partitions_key(student_input),
+            student_input.max_results or self.max_recommendations
+        )
+
+    def _quotas_key(self, student_input: StudentInput) -> Tuple:
+        """Selected quotas, compared the way the bitmap index matches them"""
+        return tuple(sorted({quota.strip().upper() for quota in student_input.quotas or []}))
+
+    def _partitions_key(self, student_input: StudentInput) -> Tuple:
+        """Selected cutoff years and rounds, the defaults spelled out so both forms share a key"""
+        default_year, default_round = self.data_service.default_partition
+        return (
+            tuple(sorted(set(student_input.years or [default_year]))),
+            tuple(sorted(set(student_input.rounds or [default_round])))
+        )
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit-rate statistics of the result and location caches"""
+        return {
+            'data_generation': self.data_service.generation,
+            'recommendations': self.result_cache.stats(),
+            'rankings': self.ranked_cache.stats(),
+            'locations': self.data_service.geo_service.location_cache.stats(),
+            'compute_pool': self.compute_pool.stats() if self.compute_pool else None
+        }
+
+    def compute_recommendations(
+        self,
+        student_input: StudentInput,
+        dataset: Optional[Dataset] = None,
+        explain: Optional[Dict[str, Any]] = None
+    ) -> List[CollegeResponse]:
+        """Run the full filter, distance and scoring pipeline for one request (synchronous, CPU-bound).
+
+        When an `explain` dict is passed it is filled with the row count left after each
+        filter ('funnel') and every result gets a score breakdown in additional_info.
+        """
+        dataset = self._select_dataset(student_input, dataset)
+        funnel = None
+        if explain is not None:
+            funnel = explain.setdefault('funnel', {})
+            explain['data_generation'] = dataset.generation
         try:
-            # Prepare filters from student input
-            filters = {
-                'rank': student_input.rank,
-                'category': student_input.category.value,
-                'gender': student_input.gender.value,
-                'preferred_institutes': student_input.preferred_institutes,
-                'preferred_branches': student_input.preferred_branches,
-                'max_closing_rank': student_input.max_closing_rank
-            }
             # Get filtered data
-            filtered_data = await self.data_service.get_filtered_data(filters)
+            filtered_data = self.data_service.filter_seats(self._build_filters(student_input), dataset, funnel)
             if filtered_data.empty:
-                logger.info("No colleges found matching the criteria")
                 return []
-            # Print unique city names in college data for comparison
-            unique_college_cities = set(filtered_data['City'].dropna().unique()) if 'City' in filtered_data.columns else set()
-            logger.info(f"Unique college cities in data: {list(unique_college_cities)[:20]}")
-            logger.info(f"Unique geo_data cities: {list(self.geo_data.keys())[:20]}")
             # Calculate distances if required
             if student_input.max_distance_km:
-                filtered_data = await self._filter_by_distance(
+                filtered_data = self._filter_by_distance(
                     filtered_data, 
                     student_input, 
-                    student_input.max_distance_km
+                    student_input.max_distance_km,
+                    dataset,
+                    explain
                 )
-            else:
-                logger.info("Distance filter disabled (max_distance_km is None or 0)")
-            # Calculate recommendation scores
-            recommendations = await self._calculate_recommendation_scores(
+                if funnel is not None:
+                    funnel['within_distance'] = len(filtered_data)
+            # Calculate recommendation scores and keep only the best ones
+            return self._calculate_recommendation_scores(
                 filtered_data, 
-                student_input
+                student_input,
+                student_input.max_results or self.max_recommendations,
+                explain,
+                dataset
             )
-            # Sort by recommendation score
-            recommendations.sort(key=lambda x: x.recommendation_score, reverse=True)
-            # Return top 50 recommendations
-            return recommendations[:50]
         except Exception as e:
             logger.error(f"Error generating recommendations: {str(e)}")
             raise
 
-    async def _filter_by_distance(self, df: pd.DataFrame, student_input: StudentInput, max_distance: int) -> pd.DataFrame:
+    def compute_ranked(self, student_input: StudentInput, dataset: Optional[Dataset] = None) -> RankedResult:
+        """Run the pipeline for one request and rank every matching group (synchronous, CPU-bound)"""
+        dataset = self._select_dataset(student_input, dataset)
+        filtered_data = self.data_service.filter_seats(self._build_filters(student_input), dataset)
+        if student_input.max_distance_km and not filtered_data.empty:
+            filtered_data = self._filter_by_distance(filtered_data, student_input, student_input.max_distance_km, dataset)
+        if filtered_data.empty:
+            return self._rank_groups(dataset.generation, filtered_data, np.empty(0), {}, np.empty(0, dtype=np.int64))
+        
+        started = time.perf_counter()
+        scores = self.scoring_engine.combine(
+            self.scoring_engine.score_components(filtered_data, student_input, dataset.branch_matcher)
+        )
+        record_stage('scoring', started, len(filtered_data), len(filtered_data))
+        started = time.perf_counter()
+        values, group_ids = self._group_candidates(filtered_data)
+        record_stage('grouping', started, len(filtered_data), int(group_ids.max()) + 1)
+        return self._rank_groups(dataset.generation, filtered_data, scores, values, group_ids)
+
+    def _select_dataset(self, student_input: StudentInput, dataset: Optional[Dataset]) -> Dataset:
+        """The dataset of the cutoff years and rounds the request selects (the loaded one by default)"""
+        return self.data_service.select_partitions(
+            dataset or self.data_service.dataset, student_input.years, student_input.rounds
+        )
+
+    def _build_filters(self, student_input: StudentInput) -> Dict[str, Any]:
+        """Seat filters for one student's category, gender, rank window and preferences"""
+        return {
+            'rank': student_input.rank,
+            'category': student_input.category.value,
+            'gender': student_input.gender.value,
+            'preferred_institutes': student_input.preferred_institutes,
+            'preferred_branches': student_input.preferred_branches,
+            'quotas': student_input.quotas,
+            'max_closing_rank': student_input.max_closing_rank
+        }
+
+    def _partition_key(self, student_input: StudentInput) -> Tuple:
+        """Students with equal keys share one candidate seat partition (everything but rank and location)"""
+        category = student_input.category.value
+        return (
+            'OPEN' if category == 'GENERAL' else category,
+            student_input.gender.value,
+            tuple(sorted({inst.upper() for inst in student_input.preferred_institutes})),
+            tuple(sorted({branch.upper() for branch in student_input.preferred_branches})),
+            student_input.max_closing_rank,
+            self._quotas_key(student_input),
+            self._partitions_key(student_input)
+        )
+
+    def compute_partition(
+        self,
+        students: List[StudentInput],
+        dataset: Optional[Dataset] = None
+    ) -> List[Union[List[CollegeResponse], Exception]]:
+        """Recommendations for students sharing a partition key, in order (synchronous, CPU-bound).
+
+        A student whose scoring fails gets the exception in their slot instead of a list.
+
+        The seats are filtered once for the best rank in the partition; every student then
+        takes the rows inside their own rank window. Text-based work (institute and branch
+        matching, grouping) is done once for the partition, and home state matching once
+        per distinct home state.
+        """
+        template = min(students, key=lambda student: student.rank)
+        dataset = self._select_dataset(template, dataset)
+        candidates = self.data_service.filter_seats(self._build_filters(template), dataset)
+        if candidates.empty:
+            return [[] for _ in students]
+        
+        started = time.perf_counter()
+        values, group_ids = self._group_candidates(candidates)
+        values = {column: series.to_numpy() for column, series in values.items()}
+        shared_components = {
+            'institute_match': self.scoring_engine._institute_match(candidates, template),
+            'branch_match': self.scoring_engine._branch_match(candidates, template, dataset.branch_matcher)
+        }
+        record_stage('grouping', started, len(candidates), int(group_ids.max()) + 1)
+        home_state_components = {}
+        closing_ranks = candidates['closing_rank'].to_numpy()
+        
+        results = []
+        for student_input in students:
+            try:
+                # Same window the rank index applies for a single request
+                df = candidates[closing_ranks >= student_input.rank]
+                if student_input.max_distance_km:
+                    df = self._filter_by_distance(df, student_input, student_input.max_distance_km, dataset)
+                if df.empty:
+                    results.append([])
+                    continue
+                rows = candidates.index.get_indexer(df.index)
+                
+                started = time.perf_counter()
+                home_state = (student_input.home_state or '').upper()
+                if home_state not in home_state_components:
+                    home_state_components[home_state] = self.scoring_engine._home_state_match(candidates, student_input)
+                components = {
+                    'rank_safety': self.scoring_engine._rank_safety(df, student_input),
+                    'institute_match': shared_components['institute_match'][rows],
+                    'branch_match': shared_components['branch_match'][rows],
+                    'distance_score': self.scoring_engine._distance_score(df),
+                    'home_state_match': home_state_components[home_state][rows]
+                }
+                scores = self.scoring_engine.combine(components)
+                record_stage('scoring', started, len(df), len(df))
+                
+                results.append(self._build_recommendations(
+                    df,
+                    scores,
+                    components,
+                    {column: column_values[rows] for column, column_values in values.items()},
+                    # Renumber so the student's groups are again in order of first appearance
+                    pd.factorize(group_ids[rows])[0],
+                    student_input.max_results or self.max_recommendations
+                ))
+            except Exception as e:
+                logger.error(f"Error generating batch recommendations: {str(e)}")
+                results.append(e)
+        return results
+
+    def _filter_by_distance(
+        self,
+        df: pd.DataFrame,
+        student_input: StudentInput,
+        max_distance: int,
+        dataset: Dataset,
+        explain: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
         """Filter colleges by distance from home city (or state if city not provided)"""
+        started = time.perf_counter()
         try:
             # Use home_city if provided, else fallback to home_state
             home_location = student_input.home_city or student_input.home_state
-            logger.info(f"Looking up coordinates for home location: {home_location}")
-            home_coords = await self._get_coordinates(home_location)
+            home_coords = dataset.geo_service.get_coordinates(home_location) if home_location else None
+            if explain is not None:
+                explain['home_location'] = {'query': home_location, 'coordinates': home_coords}
             if not home_coords:
                 logger.warning(f"Could not get coordinates for {home_location}")
                 return df
-            valid_rows = []
-            for _, row in df.iterrows():
-                college_city = row.get('City', row.get('city', ''))
-                logger.info(f"Looking up coordinates for college city: {college_city}")
-                if not college_city:
-                    logger.warning(f"Skipping row due to missing city: {row.to_dict()}")
-                    continue  # skip if city is missing
-                college_coords = await self._get_coordinates(college_city)
-                if not college_coords:
-                    logger.warning(f"Skipping row due to failed coordinate lookup for city: {college_city} | Row: {row.to_dict()}")
-                    continue
-                distance = geodesic(home_coords, college_coords).kilometers
-                if distance <= max_distance:
-                    row_dict = row.to_dict()
-                    row_dict['distance_km'] = round(distance, 2)
-                    valid_rows.append(row_dict)
-            logger.info(f"Rows after distance filtering: {len(valid_rows)}")
-            return pd.DataFrame(valid_rows)
+            # College coordinates were resolved at load; rows without them never pass the mask
+            distances = haversine_km(
+                home_coords[0], home_coords[1],
+                df['latitude'].to_numpy(), df['longitude'].to_numpy()
+            )
+            within = distances <= max_distance
+            filtered_df = df[within].assign(distance_km=np.round(distances[within], 2))
+            record_stage('distance', started, len(df), len(filtered_df))
+            return filtered_df
         except Exception as e:
             logger.error(f"Error filtering by distance: {str(e)}")
             return df
 
-    def normalize(self, s):
-        return re.sub(r'[^a-z0-9]', '', s.lower().strip()) if s else ''
-
-    async def _get_coordinates(self, location: str) -> tuple:
-        """Get coordinates for a city with caching and geo_data lookup, with suffix and fuzzy matching"""
-        if location in self.location_cache:
-            return self.location_cache[location]
-        # Use only the city name for lookup
-        city = location.split(',')[0] if ',' in location else location
-        norm_city = self.normalize(city)
-        coords = self.geo_data.get(norm_city)
-        if coords:
-            logger.info(f"Geo_data HIT for city '{city}' (normalized: '{norm_city}') -> {coords}")
-            self.location_cache[location] = coords
-            return coords
-        # Suffix handling: look for any key that starts with norm_city
-        for key in self.geo_data:
-            if key.startswith(norm_city):
-                coords = self.geo_data[key]
-                logger.info(f"Geo_data SUFFIX MATCH for city '{city}' (normalized: '{norm_city}') -> {key} -> {coords}")
-                self.location_cache[location] = coords
-                return coords
-        # Fuzzy matching: use difflib to find the closest match
-        close_matches = difflib.get_close_matches(norm_city, self.geo_data.keys(), n=1, cutoff=0.8)
-        if close_matches:
-            match = close_matches[0]
-            coords = self.geo_data[match]
-            logger.info(f"Geo_data FUZZY MATCH for city '{city}' (normalized: '{norm_city}') -> {match} -> {coords}")
-            self.location_cache[location] = coords
-            return coords
-        logger.info(f"Geo_data MISS for city '{city}' (normalized: '{norm_city}'), returning None (no geopy fallback)")
-        self.location_cache[location] = None
-        return None
-
-    def _extract_state_from_institute_name(self, institute_name: str) -> str:
-        """Extract state from institute name when state field is missing"""
-        if not institute_name:
-            return 'Unknown'
+    async def get_nearby_colleges(self, city: str, radius_km: float, k: int) -> Optional[Dict[str, Any]]:
+        """Colleges within radius_km of a city and the k nearest seats, or None if the city is unknown"""
+        dataset = await self.data_service.ensure_loaded()
+        seat_table = dataset.seat_table
+        coords = dataset.geo_service.get_coordinates(city)
+        if not coords:
+            return None
+        spatial_index = dataset.spatial_index
         
-        institute_name = str(institute_name).upper()
+        # Colleges within the radius, one entry per institute at its nearest seat
+        positions, distances = spatial_index.within_radius(coords[0], coords[1], radius_km)
+        nearby = self._with_nulls(seat_table.take(positions).assign(distance_km=np.round(distances, 2)))
+        colleges = []
+        for institute, seats in nearby.groupby('institute', sort=False, observed=True):
+            colleges.append({
+                'institute_name': institute,
+                'institute_type': seats['institute_type'].iat[0],
+                'city': seats['city'].iat[0],
+                'state': seats['state'].iat[0],
+                'distance_km': float(seats['distance_km'].iat[0]),
+                'seats': len(seats)
+            })
         
-        # IIT state mappings
-        iit_state_map = {
-            'IIT MADRAS': 'Tamil Nadu',
-            'IIT BOMBAY': 'Maharashtra', 
-            'IIT DELHI': 'Delhi',
-            'IIT KANPUR': 'Uttar Pradesh',
-            'IIT KHARAGPUR': 'West Bengal',
-            'IIT ROORKEE': 'Uttarakhand',
-            'IIT GUWAHATI': 'Assam',
-            'IIT HYDERABAD': 'Telangana',
-            'IIT INDORE': 'Madhya Pradesh',
-            'IIT MANDI': 'Himachal Pradesh',
-            'IIT PATNA': 'Bihar',
-            'IIT ROPAR': 'Punjab',
-            'IIT BHUBANESWAR': 'Odisha',
-            'IIT GANDHINAGAR': 'Gujarat',
-            'IIT JODHPUR': 'Rajasthan',
-            'IIT VARANASI': 'Uttar Pradesh',
-            'IIT PALAKKAD': 'Kerala',
-            'IIT TIRUPATI': 'Andhra Pradesh',
-            'IIT DHANBAD': 'Jharkhand',
-            'IIT BHILAI': 'Chhattisgarh',
-            'IIT GOA': 'Goa',
-            'IIT JAMMU': 'Jammu and Kashmir',
-            'IIT DHARWAD': 'Karnataka'
-        }
-        
-        # Check for exact matches first
-        for iit_name, state in iit_state_map.items():
-            if iit_name in institute_name:
-                return state
-        
-        # Check for partial matches
-        for iit_name, state in iit_state_map.items():
-            if any(word in institute_name for word in iit_name.split()):
-                return state
-        
-        return 'Unknown'
-
-    def _get_field(self, row, possible_names):
-        # Normalize row keys for robust matching
-        norm_row = {self.normalize(str(k)): v for k, v in row.items()}
-        for name in possible_names:
-            norm_name = self.normalize(name)
-            if norm_name in norm_row and not pd.isna(norm_row[norm_name]) and norm_row[norm_name] != '':
-                return norm_row[norm_name]
-        return None
-
-    async def _calculate_recommendation_scores(self, df: pd.DataFrame, student_input: StudentInput) -> List[CollegeResponse]:
-        """Calculate recommendation scores for colleges"""
-        # Group by institute, branch, and category to consolidate quota options
-        grouped_data = {}
+        # K nearest seats regardless of radius
+        positions, distances = spatial_index.nearest(coords[0], coords[1], k)
+        nearest = self._with_nulls(seat_table.take(positions).assign(distance_km=np.round(distances, 2)))
+        nearest_seats = [
+            {
+                'institute_name': seat['institute'],
+                'branch': seat['branch'],
+                'quota': seat['quota'],
+                'category': seat['category'],
+                'gender': seat['gender'],
+                'opening_rank': int(seat['opening_rank']),
+                'closing_rank': int(seat['closing_rank']),
+                'city': seat['city'],
+                'distance_km': float(seat['distance_km'])
+            }
+            for seat in nearest.to_dict('records')
+        ]
         
-        # Map all possible variations for each required field
-        field_map = {
-            'Institute': ['institute', 'institute_name', 'college_name', 'college'],
-            'Branch': ['branch', 'course', 'program'],
-            'State_Quota': ['state_quota', 'quota', 'quota_type'],
-            'Category': ['category', 'caste_category'],
-            'Gender': ['gender', 'gender_type'],
-            'Opening_Rank': ['opening_rank', 'opening_rank'],
-            'Closing_Rank': ['closing_rank', 'closing_rank'],
-            'City': ['city', 'location', 'place'],
-            'State': ['state', 'college_state', 'institute_state']
+        return {
+            'city': city,
+            'latitude': coords[0],
+            'longitude': coords[1],
+            'radius_km': radius_km,
+            'colleges': colleges,
+            'nearest_seats': nearest_seats
         }
+
+    def _with_nulls(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Replace missing values with None so rows serialize to JSON"""
+        return df.astype(object).where(df.notna(), None)
+
+    def _calculate_recommendation_scores(
+        self,
+        df: pd.DataFrame,
+        student_input: StudentInput,
+        limit: int,
+        explain: Optional[Dict[str, Any]] = None,
+        dataset: Optional[Dataset] = None
+    ) -> List[CollegeResponse]:
+        """Score every candidate and build responses for the top `limit` colleges, best first.
+
+        df must hold rows of `dataset` (the current dataset by default), whose branch codes it carries.
+        """
+        if df.empty:
+            return []
+        dataset = dataset or self.data_service.dataset
         
-        # Log a sample row for debugging
-        if not df.empty:
-            logger.info(f"Processing {len(df)} rows of data")
-            logger.info(f"Sample row columns: {list(df.columns)}")
-            sample_row = df.iloc[0]
-            logger.info(f"Sample row data: {sample_row.to_dict()}")
+        try:
+            started = time.perf_counter()
+            components = self.scoring_engine.score_components(df, student_input, dataset.branch_matcher)
+            scores = self.scoring_engine.combine(components)
+            record_stage('scoring', started, len(df), len(df))
+            
+            started = time.perf_counter()
+            values, group_ids = self._group_candidates(df)
+            record_stage('grouping', started, len(df), int(group_ids.max()) + 1)
+        except Exception as e:
+            logger.error(f"Error calculating recommendation scores: {str(e)}")
+            return []
         
+        return self._build_recommendations(df, scores, components, values, group_ids, limit, explain)
+
+    def _group_candidates(self, df: pd.DataFrame) -> Tuple[Dict[str, pd.Series], np.ndarray]:
+        """Display values of df and a group id per row, groups numbered in order of first appearance"""
+        # Missing text fields are reported as 'Unknown', missing ranks as 0
+        values = {
+            column: text_values(df[column], 'Unknown')
+            for column in ['institute', 'branch', 'quota', 'category', 'gender', 'city']
+        }
+        # State with missing values already resolved from the institute name at load
+        values['state'] = df['resolved_state'].astype(str)
+        # Group codes were assigned at load; renumber them in order of first appearance
+        group_ids, _ = pd.factorize(df['group_code'].to_numpy())
+        return values, group_ids
+
+    def _build_recommendations(
+        self,
+        df: pd.DataFrame,
+        scores: np.ndarray,
+        components: Dict[str, np.ndarray],
+        values: Dict[str, Any],
+        group_ids: np.ndarray,
+        limit: int,
+        explain: Optional[Dict[str, Any]] = None
+    ) -> List[CollegeResponse]:
+        """Responses for the `limit` best-scoring groups, each with its quota options"""
+        recommendations = []
         try:
-            for _, row in df.iterrows():
-                values = {}
-                for key, variations in field_map.items():
-                    val = self._get_field(row, variations)
-                    if val is None:
-                        logger.warning(f"Row missing required field '{key}'. Available columns: {list(row.index)}. Filling with default.")
-                        # Fill with default value
-                        if 'Rank' in key:
-                            val = 0
-                        else:
-                            val = 'Unknown'
-                    values[key] = val
-                
-                # Special handling for state field - extract from institute name if missing
-                if values['State'] == 'Unknown' or not values['State']:
-                    institute_name = str(values['Institute'])
-                    extracted_state = self._extract_state_from_institute_name(institute_name)
-                    if extracted_state != 'Unknown':
-                        values['State'] = extracted_state
-                        logger.info(f"Extracted state '{extracted_state}' from institute name '{institute_name}'")
-                
-                # Create a unique key for grouping
-                group_key = (
-                    str(values['Institute']).strip().upper(),
-                    str(values['Branch']).strip().upper(),
-                    str(values['Category']).strip().upper(),
-                    str(values['Gender']).strip().upper(),
-                    str(values['State']).strip().upper(),
-                    str(values['City']).strip().upper() if values['City'] else ''
-                )
-                
-                # Create quota option
-                opening_rank = self._safe_int(values['Opening_Rank'])
-                closing_rank = self._safe_int(values['Closing_Rank'])
-                
-                quota_option = {
-                    'quota': str(values['State_Quota']),
-                    'opening_rank': opening_rank,
-                    'closing_rank': closing_rank
-                }
-                
-                if group_key not in grouped_data:
-                    # Calculate score for this college
-                    score = await self._calculate_single_score(row, student_input)
-                    
-                    grouped_data[group_key] = {
-                        'institute_name': str(values['Institute']),
-                        'college_name': str(values['Institute']),
-                        'branch': str(values['Branch']),
-                        'category': str(values['Category']),
-                        'gender': str(values['Gender']),
-                        'state': str(values['State']),
-                        'city': str(values['City']),
-                        'distance_km': row.get('distance_km'),
-                        'institute_type': self._determine_institute_type(row),
-                        'recommendation_score': round(score, 2),
-                        'cutoff_year': '2023',
-                        'quota_options': [quota_option]
-                    }
-                else:
-                    # Add quota option to existing group
-                    grouped_data[group_key]['quota_options'].append(quota_option)
+            started = time.perf_counter()
+            # Groups are numbered in order of first appearance; their first row carries the score
+            _, first_rows = np.unique(group_ids, return_index=True)
+            top_groups = self._select_top_groups(scores[first_rows], limit)
+            if explain is not None:
+                explain['funnel'].update(scored=len(df), groups=len(first_rows), returned=len(top_groups))
             
-            # Convert grouped data to CollegeResponse objects
-            recommendations = []
-            for group_data in grouped_data.values():
-                # Sort quota options by closing rank
-                group_data['quota_options'].sort(key=lambda x: x['closing_rank'])
-                
+            # Display values as arrays (callers may pass Series or arrays)
+            values = {column: np.asarray(column_values) for column, column_values in values.items()}
+            # Quota options of the selected groups only, sorted by closing rank
+            opening_ranks = df['opening_rank'].to_numpy()
+            closing_ranks = df['closing_rank'].to_numpy()
+            quotas = values['quota']
+            selected_rows = np.flatnonzero(np.isin(group_ids, top_groups))
+            selected_rows = selected_rows[np.lexsort((closing_ranks[selected_rows], group_ids[selected_rows]))]
+            selected_ids = group_ids[selected_rows]
+            
+            distances = df['distance_km'].to_numpy() if 'distance_km' in df.columns else None
+            institute_types = df['institute_type'].to_numpy()
+            years = df['year'].to_numpy()
+            rounds = df['round'].to_numpy()
+            
+            for group_id in top_groups:
+                row = first_rows[group_id]
+                lo = np.searchsorted(selected_ids, group_id, side='left')
+                hi = np.searchsorted(selected_ids, group_id, side='right')
+                quota_options = [
+                    {
+                        'quota': quotas[i],
+                        'opening_rank': int(opening_ranks[i]),
+                        'closing_rank': int(closing_ranks[i])
+                    }
+                    for i in selected_rows[lo:hi]
+                ]
+                institute_name = values['institute'][row]
                 college_response = CollegeResponse(
-                    institute_name=group_data['institute_name'],
-                    college_name=group_data['college_name'],
-                    branch=group_data['branch'],
-                    quota_options=group_data['quota_options'],
-                    category=group_data['category'],
-                    gender=group_data['gender'],
-                    state=group_data['state'],
-                    city=group_data['city'],
-                    distance_km=group_data['distance_km'],
-                    institute_type=group_data['institute_type'],
-                    recommendation_score=group_data['recommendation_score'],
-                    cutoff_year=group_data['cutoff_year'],
+                    institute_name=institute_name,
+                    college_name=institute_name,
+                    branch=values['branch'][row],
+                    quota_options=quota_options,
+                    category=values['category'][row],
+                    gender=values['gender'][row],
+                    state=values['state'][row],
+                    city=values['city'][row],
+                    distance_km=distances[row] if distances is not None else None,
+                    institute_type=institute_types[row],
+                    recommendation_score=round(float(scores[row]), 2),
+                    cutoff_year=str(years[row]),
+                    cutoff_round=int(rounds[row]),
                     additional_info={}
                 )
+                if explain is not None:
+                    college_response.additional_info['score_breakdown'] = {
+                        name: float(component[row]) for name, component in components.items()
+                    }
                 recommendations.append(college_response)
+            record_stage('response', started, len(df), len(recommendations))
                 
         except Exception as e:
             logger.error(f"Error calculating recommendation scores: {str(e)}")
         
         return recommendations
 
-    async def _calculate_single_score(self, row: pd.Series, student_input: StudentInput) -> float:
-        """Calculate recommendation score for a single college (normalized 0-100, weighted factors, never 0 if any match)"""
-        try:
-            weights = {
-                'rank_safety': 0.4, 
-                'institute': 0.2,
-                'branch': 0.15,
-                'distance': 0.15,
-                'home_state': 0.1
-            }
-            score = 0.0
-            max_score = sum(weights.values())
-            debug_parts = []
-
-            # --- Rank Safety ---
-            closing_rank_variations = ['closing_rank', 'closing_rank']
-            closing_rank = self._safe_int(self._get_field(row, closing_rank_variations) or 0)
-            rank_safety = 0.0
-            if closing_rank > 0 and student_input.rank > 0:
-                margin = (closing_rank - student_input.rank) / student_input.rank
-                if margin > 0.5:
-                    rank_safety = 1.0
-                elif margin > 0.2:
-                    rank_safety = 0.7
-                elif margin > 0:
-                    rank_safety = 0.5
-                else:
-                    rank_safety = 0.2  # less harsh, not 0.1
-            else:
-                rank_safety = 0.2  # always give some score if data is present
-            score += weights['rank_safety'] * rank_safety
-            debug_parts.append(f"rank_safety={rank_safety}")
-
-            # --- Institute Preference ---
-            institute_variations = ['institute', 'institute_name', 'college_name', 'college']
-            institute_name = str(self._get_field(row, institute_variations) or '').upper()
-            institute_match = 0.0
-            for pref_institute in student_input.preferred_institutes:
-                if pref_institute.upper() == "IIT" and "INDIAN INSTITUTE OF TECHNOLOGY" in institute_name:
-                    institute_match = 1.0
-                    break
-                elif pref_institute.upper() == "NIT" and "NATIONAL INSTITUTE OF TECHNOLOGY" in institute_name:
-                    institute_match = 1.0
-                    break
-                elif pref_institute.upper() == "IIIT" and "INDIAN INSTITUTE OF INFORMATION TECHNOLOGY" in institute_name:
-                    institute_match = 1.0
-                    break
-                elif pref_institute.upper() == "GFTI" and ("INDIAN INSTITUTE OF TECHNOLOGY" not in institute_name and 
-                                                          "NATIONAL INSTITUTE OF TECHNOLOGY" not in institute_name and 
-                                                          "INDIAN INSTITUTE OF INFORMATION TECHNOLOGY" not in institute_name):
-                    institute_match = 1.0
-                    break
-            if institute_match == 0.0 and institute_name:
-                institute_match = 0.2  # partial score if no match but data present
-            score += weights['institute'] * institute_match
-            debug_parts.append(f"institute_match={institute_match}")
-
-            # --- Branch Preference ---
-            branch_variations = ['branch', 'course', 'program']
-            branch_name = str(self._get_field(row, branch_variations) or '').upper()
-            branch_match = 0.0
-            for pref_branch in student_input.preferred_branches:
-                if pref_branch.upper() in branch_name:
-                    branch_match = 1.0
-                    break
-            if branch_match == 0.0 and branch_name:
-                branch_match = 0.2
-            score += weights['branch'] * branch_match
-            debug_parts.append(f"branch_match={branch_match}")
-
-            # --- Distance ---
-            distance_score = 0.0
-            if 'distance_km' in row and row['distance_km'] is not None:
-                distance = row['distance_km']
-                if distance < 100:
-                    distance_score = 1.0
-                elif distance < 300:
-                    distance_score = 0.7
-                elif distance < 500:
-                    distance_score = 0.4
-                else:
-                    distance_score = 0.2
-            else:
-                distance_score = 0.2
-            score += weights['distance'] * distance_score
-            debug_parts.append(f"distance_score={distance_score}")
-
-            # --- Home State Quota ---
-            state_variations = ['state', 'college_state', 'institute_state']
-            quota_variations = ['state_quota', 'quota', 'quota_type']
-            college_state = str(self._get_field(row, state_variations) or '').upper()
-            quota = str(self._get_field(row, quota_variations) or '').upper()
-            home_state_match = 0.0
-            if (student_input.home_state and student_input.home_state.upper() in college_state) or ('HS' in quota or 'HOME STATE' in quota):
-                home_state_match = 1.0
-            elif college_state or quota:
-                home_state_match = 0.2
-            score += weights['home_state'] * home_state_match
-            debug_parts.append(f"home_state_match={home_state_match}")
-
-            # --- Normalize to 0-100 ---
-            normalized_score = int(round((score / max_score) * 100))
-            if normalized_score == 0:
-                normalized_score = 10  # minimum score if any data present
-            logger.info(f"[SCORE DEBUG] {debug_parts} => {normalized_score}")
-            return normalized_score
-        except Exception as e:
-            logger.error(f"Error calculating score for row: {str(e)}")
-            return 10  # Return 10 on error
-
-    def _safe_int(self, value) -> int:
-        """Safely convert value to integer"""
-        try:
-            if pd.isna(value) or value is None:
-                return 0
-            if isinstance(value, str):
-                # Remove any non-numeric characters except decimal point
-                cleaned = ''.join(c for c in value if c.isdigit() or c == '.')
-                if not cleaned:
-                    return 0
-                return int(float(cleaned))
-            return int(float(value))
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Failed to convert '{value}' to int: {e}")
-            return 0
-
-    def _determine_institute_type(self, row: pd.Series) -> str:
-        """Determine institute type from row data (robust, non-overlapping)"""
-        institute_variations = ['institute', 'institute_name', 'college_name', 'college']
-        institute_name = self._get_field(row, institute_variations)
-        if not institute_name:
-            return 'Other'
-        institute_name = str(institute_name).upper()
+    def _rank_groups(
+        self,
+        generation: int,
+        df: pd.DataFrame,
+        scores: np.ndarray,
+        values: Dict[str, Any],
+        group_ids: np.ndarray
+    ) -> RankedResult:
+        """All groups of df in the order _build_recommendations returns them, as a RankedResult"""
+        _, first_rows = np.unique(group_ids, return_index=True)
+        order = self._select_top_groups(scores[first_rows], len(first_rows))
+        rank_of_group = np.empty(len(order), dtype=np.int64)
+        rank_of_group[order] = np.arange(len(order))
+        
+        # Rows laid out group by group in rank order, each group's quota options by closing rank
+        row_ranks = rank_of_group[group_ids]
+        closing_ranks = df['closing_rank'].to_numpy()
+        rows = np.lexsort((closing_ranks, row_ranks))
+        offsets = np.searchsorted(row_ranks[rows], np.arange(len(order) + 1))
         
-        # Use simple string matching based on actual institute names
-        if "INDIAN INSTITUTE OF INFORMATION TECHNOLOGY" in institute_name:
-            return 'IIIT'
-        elif "INDIAN INSTITUTE OF TECHNOLOGY" in institute_name:
-            return 'IIT'
-        elif "NATIONAL INSTITUTE OF TECHNOLOGY" in institute_name:
-            return 'NIT'
+        values = {column: np.asarray(column_values) for column, column_values in values.items()}
+        lead_rows = first_rows[order]
+        groups = {
+            column: values[column][lead_rows] if len(order) else np.empty(0, dtype=object)
+            for column in ['institute', 'branch', 'category', 'gender', 'state', 'city']
+        }
+        groups['institute_type'] = df['institute_type'].to_numpy()[lead_rows].astype(object)
+        groups['score'] = scores[lead_rows]
+        groups['cutoff_year'] = df['year'].to_numpy()[lead_rows]
+        groups['cutoff_round'] = df['round'].to_numpy()[lead_rows]
+        groups['distance_km'] = (
+            df['distance_km'].to_numpy()[lead_rows] if 'distance_km' in df.columns else np.full(len(order), np.nan)
+        )
+        quota_options = {
+            'quota': values['quota'][rows] if len(order) else np.empty(0, dtype=object),
+            'opening_rank': df['opening_rank'].to_numpy()[rows],
+            'closing_rank': closing_ranks[rows]
+        }
+        return RankedResult(generation, groups, quota_options, offsets)
+
+    def _select_top_groups(self, group_scores: np.ndarray, limit: int) -> np.ndarray:
+        """Ids of the `limit` best groups by score, ties kept in order of first appearance"""
+        n_groups = len(group_scores)
+        # Scores are integers, so one int64 key orders by score, then by earliest group
+        keys = group_scores.astype(np.int64) * n_groups + (n_groups - 1 - np.arange(n_groups))
+        if limit < n_groups:
+            candidates = np.argpartition(-keys, limit - 1)[:limit]
         else:
-            # All other institutes are considered GFTI
-            return 'GFTI'
\ No newline at end of file
+            candidates = np.arange(n_groups)
+        return candidates[np.argsort(-keys[candidates])]
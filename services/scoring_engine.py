@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict
+
+from models.student_input import StudentInput
+from services.branch_matcher import BranchMatcher
+from services.data_service import text_values
+from services.institutes import institute_type_mask
+
+logger = logging.getLogger(__name__)
+
+
+class ScoringEngine:
+    """Vectorized recommendation scoring over a whole candidate set (normalized 0-100, weighted factors)"""
+
+    WEIGHTS = {
+        'rank_safety': 0.4,
+        'institute_match': 0.2,
+        'branch_match': 0.15,
+        'distance_score': 0.15,
+        'home_state_match': 0.1
+    }
+
+    def score(self, df: pd.DataFrame, student_input: StudentInput, branch_matcher: BranchMatcher) -> np.ndarray:
+        """Return integer scores for every row of df, never 0 if any data is present"""
+        return self.combine(self.score_components(df, student_input, branch_matcher))
+
+    def combine(self, components: Dict[str, np.ndarray]) -> np.ndarray:
+        """Weight and normalize score components into integer scores"""
+        score = np.zeros(len(next(iter(components.values()))))
+        for name, weight in self.WEIGHTS.items():
+            score += weight * components[name]
+        max_score = sum(self.WEIGHTS.values())
+        normalized = np.round((score / max_score) * 100).astype(np.int64)
+        normalized[normalized == 0] = 10  # minimum score if any data present
+        return normalized
+
+    def score_components(
+        self,
+        df: pd.DataFrame,
+        student_input: StudentInput,
+        branch_matcher: BranchMatcher
+    ) -> Dict[str, np.ndarray]:
+        """Compute every weighted score component as a column over df (rows of the matcher's dataset)"""
+        return {
+            'rank_safety': self._rank_safety(df, student_input),
+            'institute_match': self._institute_match(df, student_input),
+            'branch_match': self._branch_match(df, student_input, branch_matcher),
+            'distance_score': self._distance_score(df),
+            'home_state_match': self._home_state_match(df, student_input)
+        }
+
+    def _text(self, df: pd.DataFrame, column: str) -> pd.Series:
+        return text_values(df[column], '').str.upper()
+
+    def _rank_safety(self, df: pd.DataFrame, student_input: StudentInput) -> np.ndarray:
+        closing_rank = df['closing_rank'].to_numpy(dtype=np.int64)
+        if student_input.rank <= 0:
+            return np.full(len(df), 0.2)
+        margin = (closing_rank - student_input.rank) / student_input.rank
+        rank_safety = np.select([margin > 0.5, margin > 0.2, margin > 0], [1.0, 0.7, 0.5], default=0.2)
+        # Always give some score if data is present
+        return np.where(closing_rank > 0, rank_safety, 0.2)
+
+    def _institute_match(self, df: pd.DataFrame, student_input: StudentInput) -> np.ndarray:
+        matched = institute_type_mask(df, student_input.preferred_institutes)
+        # Partial score if no match but data present ('Other' means the name is missing)
+        has_name = (df['institute_type'] != 'Other').to_numpy()
+        return np.where(matched, 1.0, np.where(has_name, 0.2, 0.0))
+
+    def _branch_match(self, df: pd.DataFrame, student_input: StudentInput, branch_matcher: BranchMatcher) -> np.ndarray:
+        matched, has_name = branch_matcher.match_and_presence(
+            df['branch_code'].to_numpy(), student_input.preferred_branches
+        )
+        return np.where(matched, 1.0, np.where(has_name, 0.2, 0.0))
+
+    def _distance_score(self, df: pd.DataFrame) -> np.ndarray:
+        if 'distance_km' not in df.columns:
+            return np.full(len(df), 0.2)
+        distance = pd.to_numeric(df['distance_km'], errors='coerce').to_numpy(dtype=float)
+        # Unknown distances compare False everywhere and fall through to 0.2
+        return np.select([distance < 100, distance < 300, distance < 500], [1.0, 0.7, 0.4], default=0.2)
+
+    def _home_state_match(self, df: pd.DataFrame, student_input: StudentInput) -> np.ndarray:
+        college_state = self._text(df, 'state')
+        quota = self._text(df, 'quota')
+        matched = (
+            quota.str.contains('HS', regex=False) | quota.str.contains('HOME STATE', regex=False)
+        ).to_numpy()
+        if student_input.home_state:
+            matched |= college_state.str.contains(student_input.home_state.upper(), regex=False).to_numpy()
+        has_data = (college_state.to_numpy() != '') | (quota.to_numpy() != '')
+        return np.where(matched, 1.0, np.where(has_data, 0.2, 0.0))
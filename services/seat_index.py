@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Tuple, Optional
+
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class RankIndex:
+    """Seat positions partitioned by (category, gender), each partition sorted by closing rank"""
+
+    def __init__(self, seat_table: pd.DataFrame):
+        self.partitions: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+        closing_rank = seat_table['closing_rank'].to_numpy()
+        groups = seat_table.groupby(['category', 'gender'], dropna=False, sort=True, observed=True).indices
+        for (category, gender), positions in groups.items():
+            order = np.argsort(closing_rank[positions], kind='stable')
+            positions = positions[order].astype(np.int64)
+            key = (self._upper(category), self._upper(gender))
+            self.partitions[key] = (closing_rank[positions], positions)
+        logger.info(f"Built rank index with {len(self.partitions)} (category, gender) partitions")
+
+    @classmethod
+    def from_partitions(cls, partitions: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]) -> "RankIndex":
+        """Index over already sorted (closing ranks, positions) per (category, gender), used as given"""
+        index = cls.__new__(cls)
+        index.partitions = partitions
+        return index
+
+    def _upper(self, value) -> Optional[str]:
+        return value.upper() if isinstance(value, str) else None
+
+    def lookup(
+        self,
+        category: Optional[str] = None,
+        gender: Optional[str] = None,
+        min_closing_rank: Optional[int] = None,
+        max_closing_rank: Optional[int] = None,
+    ) -> np.ndarray:
+        """Return sorted seat table positions whose closing rank lies in the given window.
+
+        Category and gender are matched as upper-case substrings of the partition keys,
+        the same way the request filters treat them.
+        """
+        slices = []
+        for (part_category, part_gender), (ranks, positions) in self.partitions.items():
+            if category and (part_category is None or category not in part_category):
+                continue
+            if gender and (part_gender is None or gender not in part_gender):
+                continue
+            # Two bisections give the contiguous run of seats inside the window
+            lo = np.searchsorted(ranks, min_closing_rank, side='left') if min_closing_rank else 0
+            hi = np.searchsorted(ranks, max_closing_rank, side='right') if max_closing_rank else len(ranks)
+            if lo < hi:
+                slices.append(positions[lo:hi])
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        # Keep seat table order so downstream grouping sees rows as before
+        return np.sort(np.concatenate(slices))
+
+
+class BitmapIndex:
+    """Packed row bitsets per value of low-cardinality seat dimensions.
+
+    Each dimension is an integer code per row (-1 for missing). The bitset of a single
+    value is built on first use and kept; a selection ORs the accepted values within a
+    dimension and ANDs the dimensions, so any number of predicates costs a few passes
+    over n/8 bytes. Selections are cached, so repeated preference sets are free.
+    """
+
+    # Above this many accepted values one pass over the codes beats ORing bitsets
+    MAX_OR_VALUES = 8
+
+    def __init__(self, dimensions: Dict[str, np.ndarray], labels: Dict[str, pd.Index], cache_size: int = 256):
+        self.n_rows = len(next(iter(dimensions.values()))) if dimensions else 0
+        self.dimensions = dimensions
+        # Upper-case value of each code, per dimension
+        self.labels = labels
+        self._value_bitsets: Dict[Tuple[str, int], np.ndarray] = {}
+        self._selections = LRUCache(cache_size)
+
+    def codes_for(self, dimension: str, values: Iterable[str]) -> List[int]:
+        """Codes of the given values (compared stripped and upper-case) in a dimension"""
+        wanted = {str(value).strip().upper() for value in values}
+        return [code for code, label in enumerate(self.labels[dimension]) if label in wanted]
+
+    def _value_bitset(self, dimension: str, code: int) -> np.ndarray:
+        key = (dimension, code)
+        bitset = self._value_bitsets.get(key)
+        if bitset is None:
+            bitset = np.packbits(self.dimensions[dimension] == code)
+            self._value_bitsets[key] = bitset
+        return bitset
+
+    def _dimension_bitset(self, dimension: str, codes: FrozenSet[int]) -> np.ndarray:
+        if len(codes) > self.MAX_OR_VALUES:
+            return np.packbits(np.isin(self.dimensions[dimension], list(codes)))
+        bitset = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for code in codes:
+            bitset |= self._value_bitset(dimension, code)
+        return bitset
+
+    def select(self, predicates: Dict[str, Iterable[int]]) -> Optional[np.ndarray]:
+        """Packed bitset of rows whose code is accepted in every dimension, None without predicates"""
+        selection = None
+        for dimension, codes in sorted(predicates.items()):
+            codes = frozenset(int(code) for code in codes)
+            key = (dimension, codes)
+            bitset = self._selections.get(key)
+            if bitset is None:
+                bitset = self._dimension_bitset(dimension, codes)
+                self._selections.put(key, bitset)
+            selection = bitset if selection is None else selection & bitset
+        return selection
+
+    @staticmethod
+    def contains(bitset: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Which of the given row positions are set in a packed bitset"""
+        return ((bitset[positions >> 3] >> (7 - (positions & 7))) & 1).astype(bool)
@@ -0,0 +1,412 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.branch_matcher import BranchMatcher
+from services.dataset import Dataset, Segment
+from services.geo_service import GeoService, SpatialIndex
+from services.partitions import Partition, PartitionFile
+from services.seat_index import BitmapIndex, RankIndex
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where shared dataset mode is unsupported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the published layout below changes
+SHARED_FORMAT = 2
+
+
+class _ArrayWriter:
+    """Saves arrays as numbered .npy files in one directory and returns their names"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.count = 0
+
+    def save(self, array: np.ndarray) -> str:
+        name = f"a{self.count}"
+        self.count += 1
+        np.save(self.directory / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        return name
+
+
+def _dataset_manifest(dataset: Dataset, writer: _ArrayWriter) -> Dict[str, Any]:
+    seat_columns = []
+    for name in dataset.seat_table.columns:
+        values = dataset.seat_table[name]
+        if not isinstance(values.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(values.dtype):
+            # Text is published dictionary encoded, like the categorical columns
+            values = values.astype('category')
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            seat_columns.append({
+                'name': name,
+                'file': writer.save(values.array.codes),
+                'categories': [str(value) for value in values.cat.categories]
+            })
+        else:
+            seat_columns.append({'name': name, 'file': writer.save(values.to_numpy())})
+
+    segments = []
+    for segment, offset in zip(dataset.segments.values(), dataset.offsets):
+        segments.append({
+            'file_key': segment.file_key,
+            'signature': segment.signature,
+            'partition': list(segment.partition),
+            'start': int(offset),
+            'stop': int(offset) + len(segment.seats),
+            'columns': list(segment.seats.columns),
+            'rank_index': [
+                {'key': list(key), 'ranks': writer.save(ranks), 'positions': writer.save(positions)}
+                for key, (ranks, positions) in segment.rank_index.partitions.items()
+            ]
+        })
+
+    bitmap_index = dataset.bitmap_index
+    spatial_index = dataset.spatial_index
+    geo_data = dataset.geo_service.geo_data
+    return {
+        'seat_columns': seat_columns,
+        'segments': segments,
+        'branch_names': [str(name) for name in dataset.branch_matcher.names],
+        'bitmap_index': {
+            dimension: {
+                'file': writer.save(codes),
+                'labels': [str(label) for label in bitmap_index.labels[dimension]]
+            }
+            for dimension, codes in bitmap_index.dimensions.items()
+        },
+        'spatial_index': {
+            'cell_deg': spatial_index.cell_deg,
+            'cell_ids': writer.save(spatial_index.cell_ids),
+            'positions': writer.save(spatial_index.positions),
+            'lats': writer.save(spatial_index.lats),
+            'lons': writer.save(spatial_index.lons)
+        },
+        'geo': {
+            'signature': dataset.geo_signature,
+            'cities': list(geo_data),
+            'city_names': dataset.geo_service.city_names,
+            'latitude': writer.save(np.array([lat for lat, _ in geo_data.values()], dtype=float)),
+            'longitude': writer.save(np.array([lon for _, lon in geo_data.values()], dtype=float))
+        },
+        'partitions': [
+            {
+                'partition': list(partition),
+                'files': [
+                    {'file_key': partition_file.file_key, 'path': str(partition_file.path),
+                     'signature': partition_file.signature}
+                    for partition_file in partition_files
+                ]
+            }
+            for partition, partition_files in dataset.partitions.items()
+        ]
+    }
+
+
+def write_dataset(dataset: Dataset, directory: Path, **extra) -> Dict[str, Any]:
+    """Write dataset's arrays and manifest (with `extra` entries) into an existing directory.
+
+    The manifest is written last, so a directory without one is incomplete.
+    """
+    manifest = _dataset_manifest(dataset, _ArrayWriter(directory))
+    manifest.update(extra)
+    (directory / 'manifest.json').write_text(json.dumps(manifest))
+    return manifest
+
+
+class SharedDatasetStore:
+    """A loaded dataset published as memory-mapped column files for every worker process of a host.
+
+    One process loads the data folder and publishes the result: each seat table column
+    (categoricals as their codes), the rank, bitmap and spatial index arrays, and a manifest
+    with the small parts (categories, labels, city names, file signatures). Other processes
+    attach by memory-mapping the arrays read-only, so all of them share one copy through
+    the page cache instead of parsing and holding their own. Keep the folder on tmpfs
+    (e.g. /dev/shm) so the shared copy lives in RAM.
+
+    current.json names the newest generation and gen-<n>/ holds its manifest and arrays.
+    publish.lock is held by the process loading and publishing, so only one does at a time.
+    """
+
+    def __init__(self, folder_path: Path, schema: int, default_partition: Partition):
+        if fcntl is None:
+            raise RuntimeError("Shared dataset mode needs fcntl file locks, which this platform lacks")
+        self.folder_path = Path(folder_path)
+        # Publications of another seat schema or default partition are never attached
+        self.schema = schema
+        self.default_partition = list(default_partition)
+        self._lock_file = None
+        self._pointer_key = None
+        self._pointer: Dict[str, Any] = {}
+
+    @property
+    def _pointer_path(self) -> Path:
+        return self.folder_path / 'current.json'
+
+    def _generation_dir(self, generation: int) -> Path:
+        return self.folder_path / f"gen-{generation}"
+
+    def acquire(self):
+        """Block until this process holds the publish lock"""
+        self.folder_path.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.folder_path / 'publish.lock', 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        self._lock_file = lock_file
+
+    def release(self):
+        lock_file, self._lock_file = self._lock_file, None
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _read_pointer(self) -> Dict[str, Any]:
+        """Contents of current.json, re-read only when the file was replaced since the last call"""
+        try:
+            stat = self._pointer_path.stat()
+            key = (stat.st_ino, stat.st_mtime_ns)
+            if key != self._pointer_key:
+                self._pointer = json.loads(self._pointer_path.read_text())
+                self._pointer_key = key
+        except (OSError, ValueError):
+            self._pointer_key, self._pointer = None, {}
+        return self._pointer
+
+    def current_generation(self) -> int:
+        """Generation of the newest attachable publication, 0 if there is none (one stat call when unchanged)"""
+        pointer = self._read_pointer()
+        if (
+            pointer.get('format') != SHARED_FORMAT
+            or pointer.get('schema') != self.schema
+            or pointer.get('default_partition') != self.default_partition
+        ):
+            return 0
+        return pointer.get('generation', 0)
+
+    def publish(self, dataset: Dataset) -> int:
+        """Write dataset as the next generation and make it current; returns that generation.
+
+        File signatures are published with the segments, so a process that attaches can
+        tell which source files changed since. Call with the publish lock held.
+        """
+        generation = self._read_pointer().get('generation', 0) + 1
+        generation_dir = self._generation_dir(generation)
+        if generation_dir.exists():
+            shutil.rmtree(generation_dir)
+        generation_dir.mkdir(parents=True)
+        try:
+            write_dataset(dataset, generation_dir, generation=generation)
+            pointer = {
+                'format': SHARED_FORMAT,
+                'schema': self.schema,
+                'default_partition': self.default_partition,
+                'generation': generation
+            }
+            # Readers only ever see a complete generation: the pointer is replaced atomically last
+            tmp_path = self.folder_path / 'current.json.tmp'
+            tmp_path.write_text(json.dumps(pointer))
+            os.replace(tmp_path, self._pointer_path)
+        except Exception:
+            shutil.rmtree(generation_dir, ignore_errors=True)
+            raise
+        # Attached processes keep their mappings of removed files; the previous generation is
+        # kept for processes that read the old pointer but have not mapped its files yet
+        for old_dir in self.folder_path.glob('gen-*'):
+            suffix = old_dir.name[len('gen-'):]
+            if suffix.isdigit() and int(suffix) < generation - 1:
+                shutil.rmtree(old_dir, ignore_errors=True)
+        return generation
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """Manifest of the current publication, None if there is no attachable one"""
+        generation = self.current_generation()
+        if not generation:
+            return None
+        return json.loads((self._generation_dir(generation) / 'manifest.json').read_text())
+
+    def attach(self, geo_cache_size: int = 4096) -> Optional[Dataset]:
+        """Dataset over the current publication's memory-mapped arrays, None if there is none.
+
+        Only categories, labels and the city lookup are built in this process; every
+        per-seat array is a read-only mapping shared with the other attached processes.
+        Non-resident partition files are listed without their tables, which are read
+        from their snapshots when a query selects them.
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        return attach_dataset(self._generation_dir(manifest['generation']), manifest, manifest['generation'],
+                              geo_cache_size=geo_cache_size)
+
+
+class PartitionDatasetStore:
+    """Datasets of cutoff partition selections, written once with their indexes and memory-mapped.
+
+    A query selecting other years or rounds than the default one searches a dataset
+    over those partitions' files. It is built once per selection and source version,
+    written to <folder>/<selection hash>/ in the shared dataset layout, and attached from
+    then on by every worker process, which all share one copy through the page cache.
+    A selection is identified by the content hashes of its files and of the geo data,
+    so storing one drops the selections that were built from another version of them.
+    """
+
+    def __init__(self, folder_path: Path, schema: int):
+        self.folder_path = Path(folder_path)
+        self.schema = schema
+
+    def selection_key(
+        self,
+        files: List[Tuple[str, Optional[Dict[str, Any]]]],
+        geo_signature: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Identity of a selection of (file key, signature) pairs, None when a file's version is unknown"""
+        if any(signature is None for _, signature in files):
+            return None
+        return {
+            'format': SHARED_FORMAT,
+            'schema': self.schema,
+            'files': [[file_key, signature['sha256']] for file_key, signature in files],
+            'geo': geo_signature['sha256'] if geo_signature else None
+        }
+
+    def _selection_dir(self, key: Dict[str, Any]) -> Path:
+        return self.folder_path / hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:16]
+
+    def attach(self, key: Dict[str, Any], generation: int, geo_service: GeoService) -> Optional[Dataset]:
+        """The stored dataset of this selection as of `generation`, or None if it is not stored"""
+        selection_dir = self._selection_dir(key)
+        try:
+            manifest = json.loads((selection_dir / 'manifest.json').read_text())
+            if manifest.get('selection') != key:
+                return None
+            return attach_dataset(selection_dir, manifest, generation, geo_service=geo_service)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable partition dataset {selection_dir.name}: {str(e)}")
+            return None
+
+    def save(self, key: Dict[str, Any], dataset: Dataset):
+        """Store dataset for this selection and drop selections built from other file versions"""
+        selection_dir = self._selection_dir(key)
+        try:
+            self.folder_path.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed into place, so readers never see a partial selection
+            tmp_dir = Path(tempfile.mkdtemp(prefix='.tmp-', dir=self.folder_path))
+            try:
+                write_dataset(dataset, tmp_dir, selection=key)
+                os.rename(tmp_dir, selection_dir)
+            except Exception:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                # Another process may have stored the same selection first
+                if not (selection_dir / 'manifest.json').exists():
+                    raise
+            self._drop_stale(key, selection_dir)
+        except Exception as e:
+            logger.warning(f"Could not write partition dataset {selection_dir.name}: {str(e)}")
+
+    def _drop_stale(self, key: Dict[str, Any], selection_dir: Path):
+        hashes = dict(key['files'])
+        for other_dir in self.folder_path.iterdir():
+            if other_dir == selection_dir or other_dir.name.startswith('.tmp-'):
+                continue
+            try:
+                other = json.loads((other_dir / 'manifest.json').read_text())['selection']
+            except (OSError, ValueError, KeyError):
+                continue
+            # Processes that mapped a removed selection keep their mappings
+            if (
+                other.get('format') != key['format']
+                or other.get('schema') != key['schema']
+                or other.get('geo') != key['geo']
+                or any(hashes.get(file_key, sha256) != sha256 for file_key, sha256 in other.get('files', []))
+            ):
+                shutil.rmtree(other_dir, ignore_errors=True)
+
+
+def attach_dataset(
+    directory: Path,
+    manifest: Dict[str, Any],
+    generation: int,
+    geo_service: Optional[GeoService] = None,
+    geo_cache_size: int = 4096
+) -> Dataset:
+    """Dataset over the memory-mapped arrays written to directory by write_dataset.
+
+    Only categories, labels and the city lookup are built in this process (the lookup
+    not even that when `geo_service` is given); every per-seat array is a read-only
+    mapping shared with the other processes that attached the same files.
+    """
+    def load(name: str) -> np.ndarray:
+        return np.load(directory / f"{name}.npy", mmap_mode='r', allow_pickle=False)
+
+    columns = {}
+    for column in manifest['seat_columns']:
+        values = load(column['file'])
+        if 'categories' in column:
+            # Codes were written by pandas itself, so they are not checked again
+            values = pd.Categorical.from_codes(
+                values, dtype=pd.CategoricalDtype(column['categories']), validate=False
+            )
+        columns[column['name']] = values
+    seat_table = pd.DataFrame(columns, copy=False)
+
+    segments: List[Segment] = []
+    for entry in manifest['segments']:
+        start, stop = entry['start'], entry['stop']
+        seats = pd.DataFrame({column: columns[column][start:stop] for column in entry['columns']}, copy=False)
+        rank_index = RankIndex.from_partitions({
+            tuple(part['key']): (load(part['ranks']), load(part['positions']))
+            for part in entry['rank_index']
+        })
+        segment = Segment(entry['file_key'], entry['signature'], seats, tuple(entry['partition']), rank_index)
+        segment.latitude = columns['latitude'][start:stop]
+        segment.longitude = columns['longitude'][start:stop]
+        segments.append(segment)
+
+    geo = manifest['geo']
+    if geo_service is None:
+        geo_service = GeoService(cache_size=geo_cache_size)
+        geo_service.load(pd.DataFrame({
+            'City': geo['cities'],
+            'Latitude': load(geo['latitude']),
+            'Longitude': load(geo['longitude'])
+        }))
+        geo_service.city_names = geo['city_names']
+
+    spatial = manifest['spatial_index']
+    partitions = {
+        tuple(entry['partition']): [
+            PartitionFile(file['file_key'], Path(file['path']), file['signature'], None)
+            for file in entry['files']
+        ]
+        for entry in manifest['partitions']
+    }
+    return Dataset.attach(
+        generation,
+        segments,
+        geo_service,
+        seat_table,
+        BranchMatcher.from_codes(columns['branch_code'], pd.Index(manifest['branch_names'], dtype=object)),
+        BitmapIndex(
+            {dimension: load(entry['file']) for dimension, entry in manifest['bitmap_index'].items()},
+            {dimension: pd.Index(entry['labels'], dtype=object) for dimension, entry in manifest['bitmap_index'].items()}
+        ),
+        SpatialIndex.from_arrays(
+            load(spatial['cell_ids']), load(spatial['positions']),
+            load(spatial['lats']), load(spatial['lons']), spatial['cell_deg']
+        ),
+        geo_signature=geo['signature'],
+        partitions=partitions
+    )
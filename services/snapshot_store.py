@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout below changes
+SNAPSHOT_FORMAT = 1
+
+
+def file_signature(file_path: Path, known: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Size, modification time and content hash identifying one version of a source file
+
+    When size and modification time still match a `known` signature, the file is not
+    read and that signature is returned; otherwise the content is hashed.
+    """
+    stat = file_path.stat()
+    if known is not None and known.get('size') == stat.st_size and known.get('mtime_ns') == stat.st_mtime_ns:
+        return known
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def same_content(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> bool:
+    """Whether two signatures describe the same file content; modification times may differ"""
+    return a is not None and b is not None and a['size'] == b['size'] and a['sha256'] == b['sha256']
+
+
+class SnapshotStore:
+    """Columnar binary snapshots of parsed tables, one directory of .npy files per source version.
+
+    Numeric columns are stored as-is; text and categorical columns are dictionary encoded
+    as int32 codes plus a category list in the manifest (categoricals load back as such).
+    A snapshot is only used when the source file's signature and the caller's schema
+    version both match what was recorded.
+    """
+
+    def __init__(self, folder_path: Path):
+        self.folder_path = Path(folder_path)
+
+    def _snapshot_dir(self, file_key: str, signature: Dict[str, Any]) -> Path:
+        return self.folder_path / file_key / signature['sha256'][:16]
+
+    def _manifest(self, snapshot_dir: Path, signature: Dict[str, Any], schema: int) -> Optional[Dict[str, Any]]:
+        """The snapshot's manifest when it was written for this source version and schema, else None"""
+        manifest_path = snapshot_dir / 'manifest.json'
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text())
+        if (
+            manifest.get('format') != SNAPSHOT_FORMAT
+            or manifest.get('schema') != schema
+            or not same_content(manifest.get('signature'), signature)
+        ):
+            return None
+        return manifest
+
+    def has(self, file_key: str, signature: Dict[str, Any], schema: int) -> bool:
+        """Whether a usable snapshot of this exact source version exists, without reading its columns"""
+        try:
+            return self._manifest(self._snapshot_dir(file_key, signature), signature, schema) is not None
+        except Exception:
+            return False
+
+    def load(
+        self,
+        file_key: str,
+        signature: Dict[str, Any],
+        schema: int,
+        mmap: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """Return the stored table for this exact source version, or None
+
+        With mmap the column files are memory-mapped rather than read, so their pages come
+        from the OS page cache on demand instead of being copied in up front.
+        """
+        snapshot_dir = self._snapshot_dir(file_key, signature)
+        try:
+            manifest = self._manifest(snapshot_dir, signature, schema)
+            if manifest is None:
+                return None
+            columns = {}
+            for column in manifest['columns']:
+                values = np.load(
+                    snapshot_dir / f"{column['file']}.npy", mmap_mode='r' if mmap else None, allow_pickle=False
+                )
+                if column['kind'] == 'categorical':
+                    # Codes were stored as-is, -1 for missing
+                    values = pd.Categorical.from_codes(values, categories=column['categories'])
+                elif column['kind'] == 'text':
+                    categories = np.array(column['categories'] + [np.nan], dtype=object)
+                    # Missing values were stored as code -1, which picks the trailing NaN
+                    values = categories[values]
+                columns[column['name']] = values
+            return pd.DataFrame(columns, columns=[column['name'] for column in manifest['columns']])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot for {file_key}: {str(e)}")
+            return None
+
+    def save(self, file_key: str, signature: Dict[str, Any], schema: int, df: pd.DataFrame):
+        """Write a snapshot for this source version and drop older ones"""
+        snapshot_dir = self._snapshot_dir(file_key, signature)
+        try:
+            if snapshot_dir.exists():
+                shutil.rmtree(snapshot_dir)
+            snapshot_dir.mkdir(parents=True)
+            manifest_columns = []
+            for i, name in enumerate(df.columns):
+                series = df[name]
+                entry = {'name': str(name), 'file': f"col{i}"}
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    np.save(snapshot_dir / f"{entry['file']}.npy", series.cat.codes.to_numpy().astype(np.int32))
+                    entry.update(kind='categorical', categories=[str(value) for value in series.cat.categories])
+                elif series.dtype == object:
+                    codes, categories = pd.factorize(series.astype(object).where(series.notna(), None))
+                    np.save(snapshot_dir / f"{entry['file']}.npy", codes.astype(np.int32))
+                    entry.update(kind='text', categories=[str(value) for value in categories])
+                else:
+                    np.save(snapshot_dir / f"{entry['file']}.npy", series.to_numpy())
+                    entry['kind'] = 'numeric'
+                manifest_columns.append(entry)
+            manifest = {
+                'format': SNAPSHOT_FORMAT,
+                'schema': schema,
+                'signature': signature,
+                'rows': len(df),
+                'columns': manifest_columns
+            }
+            # The manifest is written last and atomically, so a half-written snapshot is never used
+            tmp_path = snapshot_dir / 'manifest.json.tmp'
+            tmp_path.write_text(json.dumps(manifest))
+            os.replace(tmp_path, snapshot_dir / 'manifest.json')
+            for old_dir in (self.folder_path / file_key).iterdir():
+                if old_dir != snapshot_dir:
+                    shutil.rmtree(old_dir, ignore_errors=True)
+        except Exception as e:
+            logger.warning(f"Could not write snapshot for {file_key}: {str(e)}")